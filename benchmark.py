@@ -0,0 +1,160 @@
+"""Measure how long the stages of the app take without opening a window."""
+
+import argparse
+import os
+
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+from src import benchmark
+from src import constants
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "files",
+        help="Paths to shape files. Defaults to the text files in shapes/.",
+        nargs="*"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        metavar="<int>",
+        nargs="*",
+        help="Numbers of points of additional synthetic shapes.",
+        default=[256, 1024, 4096, 16384]
+    )
+    parser.add_argument(
+        "-n",
+        type=int,
+        metavar="<int>",
+        nargs="+",
+        help="Maximum numbers of circles to measure, 0 means all of them.",
+        default=[0, 16, 128]
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=list(benchmark.MODES),
+        help="Render modes to measure.",
+        default=list(benchmark.MODES)
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        metavar="<int>",
+        help="Number of frames measured per run.",
+        default=120
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        metavar="<int>",
+        help="Number of runs per case. The fastest time of every frame " +
+             "over the runs counts for --baseline. Defaults to 10.",
+        default=10
+    )
+    parser.add_argument(
+        "-w",
+        "--window-size",
+        metavar=("<width>", "<height>"),
+        nargs=2,
+        type=int,
+        help="Size of the surface that gets drawn on.",
+        default=constants.DEFAULT_WINDOW_SIZE
+    )
+    parser.add_argument(
+        "--table-size",
+        type=int,
+        metavar="<int>",
+        help="Same as in epicycles.py.",
+        default=None
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="<path>",
+        help="Save the report as JSON to this file.",
+        default=""
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        metavar="<path>",
+        help="Compare the results with a report saved earlier and exit " +
+             "with an error if a stage got slower.",
+        default=""
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        metavar="<float>",
+        help="How much slower than the baseline a stage may be, " +
+             "0.2 means 20%%. Defaults to 0.2.",
+        default=0.2
+    )
+    parser.add_argument(
+        "--min-difference",
+        type=float,
+        metavar="<ms>",
+        help="Ignore slowdowns of fewer milliseconds than this because " +
+             f"they are timer noise. Defaults to {constants.BENCHMARK_MIN_DIFFERENCE}.",
+        default=constants.BENCHMARK_MIN_DIFFERENCE
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Instead of measuring the time, compare --single-precision " +
+             "with double precision and the stepping of the circles with " +
+             "the direct formula and report the largest deviations."
+    )
+    parser.add_argument(
+        "--max-deviation",
+        type=float,
+        metavar="<pixels>",
+        help="Exit with an error if --verify finds a larger deviation. " +
+             "Defaults to 0.5.",
+        default=0.5
+    )
+    args = parser.parse_args()
+    if args.verify:
+        report = benchmark.verify(
+            args.files or benchmark.default_files(),
+            args.sizes,
+            args.frames,
+            args.window_size
+        )
+        if args.output:
+            benchmark.save(report, args.output)
+        deviation = max(
+            max(result["phasor_deviation"], result["tip_deviation"],
+                result["circle_deviation"])
+            for result in report["verify"]
+        )
+        if deviation > args.max_deviation:
+            raise SystemExit(f"Deviation of {deviation:.5f} px exceeds " +
+                             f"{args.max_deviation} px.")
+        raise SystemExit
+    report = benchmark.run(
+        args.files or benchmark.default_files(),
+        args.sizes,
+        args.n,
+        args.modes,
+        args.frames,
+        args.window_size,
+        repeat=args.repeat,
+        table_size=args.table_size
+    )
+    if args.output:
+        benchmark.save(report, args.output)
+    if args.baseline:
+        regressions = benchmark.compare(
+            report,
+            benchmark.load(args.baseline),
+            args.threshold,
+            args.min_difference
+        )
+        if regressions:
+            raise SystemExit(f"{len(regressions)} stages got slower.")
@@ -1,5 +1,10 @@
 """Draw various intricate shapes by adding rotating circles."""
 
+import time
+
+# Taken before the other imports for the startup time shown in debug mode.
+START_TIME = time.perf_counter()
+
 import argparse
 import os
 
@@ -7,13 +12,17 @@ os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
 
 from src import scene_manager
 from src import constants
+from src import shape_loader
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "file",
-        help="Path to file containing the desired shape.",
+        help="Path to file containing the desired shape. This can be a " +
+             "text file with one \"x y\" pair per line or an image " +
+             "with a single pixel wide path of a single color. A " +
+             "directory or a glob pattern shows all shapes in it at once.",
         default="",
         nargs="?"
     )
@@ -67,7 +76,177 @@ if __name__ == "__main__":
         action="store_true",
         help="Start the app in debug mode."
     )
+    parser.add_argument(
+        "--table-size",
+        type=int,
+        metavar="<int>",
+        help="Number of precomputed tip positions per cycle. To disable " +
+             "the table and always evaluate all circles set it to 0. " +
+             "Sizes below two times the highest frequency plus one are " +
+             "raised to that. " +
+             f"Defaults to {constants.PATH_TABLE_OVERSAMPLING} entries per " +
+             "harmonic, rounded up to a power of two.",
+        default=None
+    )
+    parser.add_argument(
+        "--table-memory",
+        type=float,
+        metavar="<MiB>",
+        help="Maximum size of the precomputed table. Larger tables fall back " +
+             "to exact evaluation. Defaults to " +
+             f"{constants.DEFAULT_PATH_TABLE_MEMORY} MiB.",
+        default=constants.DEFAULT_PATH_TABLE_MEMORY
+    )
+    parser.add_argument(
+        "-e",
+        "--export",
+        metavar="<path>",
+        help="Render without opening a window. Saves the frames as PNG " +
+             "files in this directory or, if the path ends with a video " +
+             "file extension like .mp4, encodes them with ffmpeg.",
+        default=""
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        metavar="<int>",
+        help="Number of frames to export. Defaults to one full cycle.",
+        default=0
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="<int>",
+        help="Number of processes rendering the exported frames in parallel.",
+        default=1
+    )
+    parser.add_argument(
+        "--two-opt",
+        action="store_true",
+        help="Improve the order of the pixels of a path loaded from an " +
+             "image with the 2-opt heuristic. Adds about a second per " +
+             "100000 pixels (cached with the points)."
+    )
+    parser.add_argument(
+        "--resample",
+        type=int,
+        metavar="<int>",
+        help="Resample the shape to this many (at least 2) evenly spaced " +
+             "points before calculating the circles. Powers of two are " +
+             "the fastest.",
+        default=0
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        metavar="<pixels>",
+        help="Resample the shape to the smallest power of two number of " +
+             "evenly spaced points that deviates at most this much from " +
+             "the original. Ignored if --resample is set.",
+        default=0
+    )
+    parser.add_argument(
+        "--error",
+        type=float,
+        metavar="<pixels>",
+        help="Use only the largest circles needed to keep the root mean " +
+             "square deviation from the shape below this many pixels.",
+        default=0
+    )
+    parser.add_argument(
+        "--energy",
+        type=float,
+        metavar="<float>",
+        help="A number > 0 and <= 1. Use only the largest circles needed " +
+             "to reach this share of the total energy of the shape. " +
+             "Ignored if --error is set.",
+        default=0
+    )
+    parser.add_argument(
+        "--fixed-detail",
+        action="store_true",
+        help="Don't reduce the level of detail when the frames take too long."
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Keep the line on a separate surface and only draw the " +
+             "changes instead of redrawing the whole line every frame. " +
+             "Has no effect while the line is fading."
+    )
+    parser.add_argument(
+        "--profile-csv",
+        metavar="<path>",
+        help="Save how long the stages of every frame took to this CSV file.",
+        default=""
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="<path>",
+        help="Run cProfile and save the statistics to this file on exit. " +
+             "They can be viewed with the pstats module.",
+        default=""
+    )
+    parser.add_argument(
+        "--single-precision",
+        action="store_true",
+        help="Store the circles, the precomputed table and the line with " +
+             "single instead of double precision. This halves their memory " +
+             "for huge shapes at the cost of small deviations, see " +
+             "\"python benchmark.py --verify\"."
+    )
+    parser.add_argument(
+        "--stream",
+        metavar="<path>",
+        help="Read shapes from a named pipe or, if the path is -, from " +
+             "stdin instead of a file. Each shape has one \"x y\" pair " +
+             "per line and ends with an empty line. The circles switch " +
+             "to every new shape as soon as it is complete.",
+        default=""
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="Read streamed shapes in binary: the number of points as a " +
+             "little-endian uint32 followed by the x and y coordinates " +
+             "as little-endian float32 numbers."
+    )
     args = parser.parse_args()
+    if args.file and shape_loader.is_pattern(args.file) and (
+            args.single_precision or args.incremental
+            or args.table_size is not None
+            or args.table_memory != constants.DEFAULT_PATH_TABLE_MEMORY):
+        parser.error("--single-precision, --incremental, --table-size and " +
+                     "--table-memory only work with a single shape.")
+    if args.export:
+        if not args.file:
+            parser.error("Exporting requires a file.")
+        if shape_loader.is_pattern(args.file):
+            parser.error("Exporting only works with a single shape.")
+        from src import export
+        export.export(
+            args.file,
+            args.export,
+            args.n,
+            args.scale,
+            args.fade,
+            args.reverse,
+            args.window_size,
+            args.frames,
+            args.debug,
+            args.table_size,
+            args.table_memory,
+            args.jobs,
+            args.two_opt,
+            args.resample,
+            args.tolerance,
+            args.error,
+            args.energy,
+            args.single_precision
+        )
+        raise SystemExit
     app = scene_manager.SceneManager(
         args.file,
         args.n,
@@ -76,6 +255,21 @@ if __name__ == "__main__":
         args.reverse,
         args.paused,
         args.window_size,
-        args.debug
+        args.debug,
+        args.table_size,
+        args.table_memory,
+        args.two_opt,
+        args.resample,
+        args.tolerance,
+        args.error,
+        args.energy,
+        args.fixed_detail,
+        args.incremental,
+        args.profile_csv,
+        args.cprofile,
+        args.single_precision,
+        args.stream,
+        args.binary,
+        START_TIME
     )
     app.run()
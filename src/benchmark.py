@@ -0,0 +1,386 @@
+import gc
+import glob
+import json
+import math
+import os
+import platform
+import statistics
+import time
+
+import numpy
+import pygame
+
+from src import constants
+from src import epicycles
+from src import phasors
+from src import shape_loader
+from src import transform
+
+
+# Flags of the Epicycles instance for every render mode.
+MODES = {
+    "line": {"circles_visible": False, "fade": False, "reverse": False},
+    "circles": {"circles_visible": True, "fade": False, "reverse": False},
+    "fade": {"circles_visible": False, "fade": True, "reverse": False},
+    "reverse": {"circles_visible": True, "fade": False, "reverse": True},
+}
+STAGES = ("get_point_at_angle", "update", "interpolate", "trim_line", "draw")
+REPORT_VERSION = 2
+
+
+def run(files, sizes, harmonic_counts, modes, frames, window_size,
+        repeat=5, table_size=None,
+        table_memory=constants.DEFAULT_PATH_TABLE_MEMORY):
+    """Time the stages of the app for every combination of shape, number of
+    harmonics and render mode and return the results as a dict.
+
+    The shapes are the files plus synthetic shapes with the given numbers
+    of points. All cases are measured once per sweep and there are repeat
+    sweeps, so the runs of every case are spread over the whole benchmark
+    instead of falling into one phase where other processes slow down
+    the machine. A run times transform.transform once and the other
+    stages once per frame while the app advances by a fixed dt.
+    """
+    target_surface_rect = pygame.Rect((0, 0), window_size)
+    shapes = [
+        (os.path.basename(filename),
+         shape_loader.load(filename, constants.DEFAULT_SCALE_FACTOR,
+                           target_surface_rect))
+        for filename in files
+    ]
+    shapes.extend(
+        (f"synthetic_{size}", synthetic_shape(size, target_surface_rect))
+        for size in sizes
+    )
+
+    report = {
+        "version": REPORT_VERSION,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pygame": pygame.version.ver,
+        "frames": frames,
+        "repeat": repeat,
+        "window_size": list(window_size),
+        "shapes": []
+    }
+    all_harmonics = [transform.transform(points) for _, points in shapes]
+    case_keys = [(n, mode) for n in harmonic_counts for mode in modes]
+    transform_times = [[] for _ in shapes]
+    case_runs = [[[] for _ in case_keys] for _ in shapes]
+    for sweep in range(repeat):
+        print(f"sweep {sweep + 1} of {repeat}")
+        for shape_index, ((_, points), harmonics) in enumerate(
+                zip(shapes, all_harmonics)):
+            transform_times[shape_index].extend(
+                time_calls(transform.transform, [(points,)])
+            )
+            for case_index, (n, mode) in enumerate(case_keys):
+                case_runs[shape_index][case_index].append(time_run(
+                    harmonics, n, MODES[mode], frames, window_size,
+                    table_size, table_memory
+                ))
+
+    for (name, points), harmonics, shape_transform_times, shape_case_runs in zip(
+            shapes, all_harmonics, transform_times, case_runs):
+        cases = []
+        for (n, mode), runs in zip(case_keys, shape_case_runs):
+            cases.append({
+                "n": n,
+                "mode": mode,
+                "harmonics": len(harmonics[0][:n] if n > 0 else harmonics[0]),
+                "timings": summarize_runs(runs)
+            })
+            print(f"{name} ({len(points)} points), n={n}, {mode}: " +
+                  f"update {cases[-1]['timings']['update']['best']:.3f} ms, " +
+                  f"draw {cases[-1]['timings']['draw']['best']:.3f} ms")
+        report["shapes"].append({
+            "name": name,
+            "points": len(points),
+            "transform": summarize(shape_transform_times),
+            "cases": cases
+        })
+    return report
+
+
+def verify(files, sizes, frames, window_size,
+           table_memory=constants.DEFAULT_PATH_TABLE_MEMORY):
+    """Run every shape with double and single precision side by side and
+    return the largest distances in pixels between the tips and between
+    the circle centers, with and without the path table, as a dict.
+    """
+    target_surface_rect = pygame.Rect((0, 0), window_size)
+    shapes = [
+        (os.path.basename(filename),
+         shape_loader.load(filename, constants.DEFAULT_SCALE_FACTOR,
+                           target_surface_rect))
+        for filename in files
+    ]
+    shapes.extend(
+        (f"synthetic_{size}", synthetic_shape(size, target_surface_rect))
+        for size in sizes
+    )
+
+    report = {
+        "version": REPORT_VERSION,
+        "frames": frames,
+        "window_size": list(window_size),
+        "verify": []
+    }
+    dt = 1 / constants.FPS
+    for name, points in shapes:
+        harmonics = transform.transform(points)
+        phasor_deviation = verify_phasors(harmonics, 100 * frames)
+        print(f"{name} ({len(points)} points), phasor stepping over " +
+              f"{100 * frames} frames: max deviation {phasor_deviation:.2e} px")
+        for table_size in (None, 0):
+            pair = [
+                epicycles.Epicycles(
+                    points=None,
+                    n=0,
+                    fade=False,
+                    reverse=False,
+                    surface_center=target_surface_rect.center,
+                    debug=False,
+                    table_size=table_size,
+                    table_memory=table_memory,
+                    harmonics=harmonics,
+                    dtype=dtype
+                )
+                for dtype in (numpy.complex128, numpy.complex64)
+            ]
+            memory = [
+                epi.amplitudes.nbytes + epi.frequencies.nbytes
+                + epi.trail._points.nbytes
+                + (0 if epi.path_table is None else epi.path_table.nbytes)
+                for epi in pair
+            ]
+            tip_deviation = 0
+            circle_deviation = 0
+            for _ in range(frames):
+                for epi in pair:
+                    epi.update(dt)
+                double, single = pair
+                angle = double.current_angle
+                tip_deviation = max(tip_deviation, abs(
+                    double.get_point_at_angle(angle) - single.get_point_at_angle(angle)
+                ))
+                distances = numpy.hypot(*(
+                    double.get_visible_centers() - single.get_visible_centers()
+                ).T)
+                circle_deviation = max(circle_deviation, distances.max())
+            report["verify"].append({
+                "name": name,
+                "points": len(points),
+                "harmonics": len(harmonics[0]),
+                "path_table": pair[0].path_table is not None,
+                "phasor_deviation": float(phasor_deviation),
+                "tip_deviation": float(tip_deviation),
+                "circle_deviation": float(circle_deviation),
+                "memory_double": memory[0],
+                "memory_single": memory[1]
+            })
+            print(f"{name} ({len(points)} points), " +
+                  f"{'path table' if pair[0].path_table is not None else 'exact'}: " +
+                  f"max deviation {tip_deviation:.5f} px (tip), " +
+                  f"{circle_deviation:.5f} px (circles), " +
+                  f"memory {memory[0] / 2 ** 10:.0f} KiB -> {memory[1] / 2 ** 10:.0f} KiB")
+    return report
+
+
+def verify_phasors(harmonics, frames):
+    """Return the largest distance in pixels between the tip evaluated
+    by phasor stepping and by the direct formula a * exp(b * t) over
+    frames steps. The speed and direction change every few hundred
+    frames like they do when pressing the keys.
+    """
+    amplitudes, frequencies = harmonics[:2]
+    stepper = phasors.Phasors(frequencies)
+    velocities = [1, 2, 4, -4, -1, 1 / 32, 1]
+    dt = 1 / constants.FPS
+    angle = 0
+    deviation = 0
+    for frame in range(frames):
+        angle += velocities[frame // 499 % len(velocities)] * dt
+        stepped = stepper.at(angle) @ amplitudes
+        direct = numpy.exp(frequencies * angle) @ amplitudes
+        deviation = max(deviation, abs(stepped - direct))
+    return deviation
+
+
+def summarize_runs(runs):
+    """Return the statistics of every stage over all frames of the runs.
+
+    All runs go through the same states, so every stage also gets as
+    "best" the mean over the frames of the fastest time of each frame.
+    Like the minimum of timeit this drops the interruptions by other
+    processes, which make the times of single calls too noisy to compare.
+    """
+    timings = {}
+    for stage in STAGES:
+        stage_runs = numpy.array([run_times[stage] for run_times in runs])
+        timings[stage] = summarize(
+            stage_runs.ravel().tolist(),
+            stage_runs.min(axis=0).mean()
+        )
+    return timings
+
+
+def time_run(harmonics, n, flags, frames, window_size, table_size,
+             table_memory):
+    """Advance a new Epicycles instance by frames fixed steps and
+    return the durations of every stage per frame in seconds.
+    """
+    surface = pygame.Surface(window_size)
+    epi = epicycles.Epicycles(
+        points=None,
+        n=n,
+        fade=flags["fade"],
+        reverse=flags["reverse"],
+        surface_center=surface.get_rect().center,
+        debug=False,
+        table_size=table_size,
+        table_memory=table_memory,
+        harmonics=harmonics
+    )
+    epi.circles_visible = flags["circles_visible"]
+    dt = 1 / constants.FPS
+    times = {stage: [] for stage in STAGES}
+    clock = time.perf_counter
+    # Like timeit, keep the garbage collector from adding to the times.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(frames):
+            angle = epi.current_angle + epi.angular_velocity * dt
+            start = clock()
+            epi.get_point_at_angle(angle)
+            times["get_point_at_angle"].append(clock() - start)
+
+            # Interpolate over a whole step at the highest speed.
+            step = constants.MAX_ANGULAR_VELOCITY * dt
+            p1 = epi.get_point_at_angle(angle)
+            p2 = epi.get_point_at_angle(angle + step)
+            start = clock()
+            epi.interpolate(p1, p2, angle, angle + step)
+            times["interpolate"].append(clock() - start)
+
+            start = clock()
+            epi.update(dt)
+            times["update"].append(clock() - start)
+
+            start = clock()
+            epi.trim_line()
+            times["trim_line"].append(clock() - start)
+
+            start = clock()
+            surface.fill(constants.BACKGROUND_COLOR)
+            epi.draw(surface)
+            times["draw"].append(clock() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return times
+
+
+def time_calls(function, args_list):
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarize(times, best=None):
+    """Return statistics of a list of durations in seconds as milliseconds.
+    best defaults to the shortest duration.
+    """
+    times_ms = sorted(t * 1000 for t in times)
+    return {
+        "calls": len(times_ms),
+        "best": times_ms[0] if best is None else best * 1000,
+        "mean": statistics.fmean(times_ms),
+        "median": statistics.median(times_ms),
+        "p95": times_ms[min(len(times_ms) - 1, math.ceil(0.95 * len(times_ms)) - 1)],
+        "min": times_ms[0]
+    }
+
+
+def synthetic_shape(count, target_surface_rect):
+    """Return a closed curve with count points whose harmonics decay
+    like those of a hand drawn shape, always the same for a count.
+    """
+    rng = numpy.random.default_rng(count)
+    harmonic_count = max(1, min(count // 4, 256))
+    k = numpy.arange(1, harmonic_count + 1)
+    frequencies = numpy.concatenate((k, -k))
+    amplitudes = (
+        rng.normal(size=2 * harmonic_count)
+        + 1j * rng.normal(size=2 * harmonic_count)
+    ) / numpy.abs(frequencies) ** 1.5
+    t = numpy.arange(count) * (math.tau / count)
+    curve = numpy.exp(1j * numpy.multiply.outer(t, frequencies)) @ amplitudes
+    points = numpy.column_stack((curve.real, curve.imag))
+    return transform.scale(
+        *transform.center(points),
+        constants.DEFAULT_SCALE_FACTOR,
+        target_surface_rect
+    )
+
+
+def default_files():
+    shapes_directory = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "shapes"
+    )
+    return sorted(glob.glob(os.path.join(shapes_directory, "*.txt")))
+
+
+def flatten(report):
+    """Return the best times of a report keyed by
+    "shape/n/mode/stage" and "shape/transform".
+    """
+    best = {}
+    for shape in report["shapes"]:
+        best[f"{shape['name']}/transform"] = shape["transform"]["best"]
+        for case in shape["cases"]:
+            for stage, stats in case["timings"].items():
+                key = f"{shape['name']}/{case['n']}/{case['mode']}/{stage}"
+                best[key] = stats["best"]
+    return best
+
+
+def compare(report, baseline, threshold,
+            min_difference=constants.BENCHMARK_MIN_DIFFERENCE):
+    """Print how the best times changed since the baseline and return
+    the keys that got slower by more than the threshold share and more
+    than min_difference milliseconds. Keys missing in one of the
+    reports are ignored.
+    """
+    current = flatten(report)
+    previous = flatten(baseline)
+    regressions = []
+    for key in sorted(current.keys() & previous.keys()):
+        old, new = previous[key], current[key]
+        change = (new - old) / old if old > 0 else 0
+        slower = change > threshold and new - old > min_difference
+        if slower:
+            regressions.append(key)
+        print(f"{'REGRESSION ' if slower else ''}{key}: " +
+              f"{old:.3f} ms -> {new:.3f} ms ({change:+.1%})")
+    return regressions
+
+
+def save(report, filename):
+    with open(filename, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+def load(filename):
+    with open(filename) as file:
+        report = json.load(file)
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError(f"\"{filename}\" is not a benchmark report " +
+                         f"of version {REPORT_VERSION}.")
+    return report
@@ -0,0 +1,82 @@
+import numpy
+import pygame
+import pygame.gfxdraw
+import pygame.surfarray
+
+from src import constants
+
+
+class CircleLayer:
+    """Draw the circles and the lines connecting their centers.
+
+    Circles that are too small, completely off-screen or drawn on exactly
+    the same pixels as the previous one are skipped. Small circles are
+    blitted from cached sprites in a single call and only the few large
+    ones are drawn with gfxdraw.
+    """
+
+    def __init__(self):
+        self.sprites = {}
+
+    def get_sprite(self, radius):
+        sprite = self.sprites.get(radius)
+        if sprite is None:
+            # Draw the anti-aliased circle in white on black and use the
+            # brightness as the alpha channel of the sprite.
+            size = 2 * radius + 1
+            mask = pygame.Surface((size, size))
+            pygame.gfxdraw.aacircle(mask, radius, radius, radius, (255, 255, 255))
+            sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+            sprite.fill(constants.CIRCLE_COLOR)
+            alpha = pygame.surfarray.pixels_alpha(sprite)
+            alpha[:] = pygame.surfarray.array_red(mask)
+            del alpha  # unlock the sprite
+            self.sprites[radius] = sprite
+        return sprite
+
+    def draw(self, target_surf, centers, radii, radius_cutoff):
+        """Draw the circles with the given integer radii around the first
+        centers and connect all centers with a line. centers is an
+        (m, 2) array with m > len(radii).
+        """
+        count = len(radii)
+        x = centers[:count, 0].astype(numpy.int64)
+        y = centers[:count, 1].astype(numpy.int64)
+        width, height = target_surf.get_size()
+        visible = (
+            (radii >= radius_cutoff)
+            & (x + radii >= 0) & (x - radii < width)
+            & (y + radii >= 0) & (y - radii < height)
+        )
+        visible[1:] &= (
+            (x[1:] != x[:-1]) | (y[1:] != y[:-1]) | (radii[1:] != radii[:-1])
+        )
+        indices = numpy.flatnonzero(visible)
+        small = radii[indices] <= constants.CIRCLE_SPRITE_MAX_RADIUS
+
+        sprite_indices = indices[small]
+        target_surf.blits(
+            [
+                (self.get_sprite(r), (cx - r, cy - r))
+                for cx, cy, r in zip(
+                    x[sprite_indices].tolist(),
+                    y[sprite_indices].tolist(),
+                    radii[sprite_indices].tolist()
+                )
+            ],
+            False
+        )
+        for i in indices[~small].tolist():
+            pygame.gfxdraw.aacircle(
+                target_surf,
+                int(x[i]),
+                int(y[i]),
+                int(radii[i]),
+                constants.CIRCLE_COLOR
+            )
+        pygame.draw.aalines(
+            target_surf,
+            constants.CIRCLE_COLOR,
+            False,
+            centers
+        )
@@ -1,6 +1,12 @@
+import os
+
 import pygame
 
 
+CACHE_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ".cache"
+)
 DEFAULT_WINDOW_SIZE = (700, 700)
 FPS = 60
 DT_LIMIT = 2 / FPS  # max dt is twice the normal dt
@@ -19,5 +25,35 @@ MAX_ANGULAR_VELOCITY = 4
 # Distances are squared to avoid calculating square roots.
 MIN_DISTANCE_SQ = 2.5 ** 2  # ignore point if it is closer than this to previous point
 MAX_DISTANCE_SQ = 5 ** 2  # interpolate when points are farther apart than this
+TRAIL_TILE_SIZE = 32  # in pixels, the line is redrawn tile by tile when it expires
+FADE_BANDS = 64  # number of distinct colors of the fading line
 CIRCLE_RADIUS_CUTOFF = 1  # circles with smaller radii will not be drawn
+CIRCLE_SPRITE_MAX_RADIUS = 32  # larger circles are drawn without cached sprites
 HARMONICS_RADIUS_CUTOFF = 0.01  # harmonics with smaller radii will be ignored
+DRAW_RESAMPLE_TOLERANCE = 1  # max deviation in pixels when resampling drawings
+DRAW_CAPACITY = 1024  # initial number of points a drawing can hold
+DRAW_PREVIEW_INTERVAL = 0.25  # in seconds, between updates of the circles while drawing
+PHASOR_RENORMALIZE_INTERVAL = FPS  # steps between exact evaluations of the circles
+PHASOR_STEP_TOLERANCE = 1e-12  # in radians, for steps that count as the same
+PHASOR_STEP_CACHE_SIZE = 4  # number of distinct steps whose factors are kept
+BATCH_SIZE = 2 ** 20  # max number of terms evaluated at once in batched calls
+PATH_TABLE_OVERSAMPLING = 16  # path table entries per harmonic if not set
+DEFAULT_PATH_TABLE_MEMORY = 64  # in MiB, larger tables fall back to exact evaluation
+TRAIL_CAPACITY = 4096  # initial number of points the line can hold
+EXPORT_CHUNK_FRAMES = 240  # max frames per parallel job when exporting a video
+# The governor lowers the level of detail if update and draw take longer
+# than the budget and raises it again when they are below the headroom share.
+GOVERNOR_BUDGET = 0.75 / FPS  # in seconds, leaves time for the display flip
+GOVERNOR_HEADROOM = 0.5
+GOVERNOR_SMOOTHING = 0.1  # weight of the newest frame time in the average
+GOVERNOR_COOLDOWN_FRAMES = FPS // 2  # frames to wait after changing the level
+GOVERNOR_MAX_LEVEL = 6
+PROFILER_WINDOW = 2 * FPS  # number of frames in the statistics of the debug overlay
+PROFILER_GRAPH_HEIGHT = 64  # in pixels, for two times the frame time at FPS
+HARMONICS_CACHE_SIZE = 8  # number of shapes whose harmonics are kept in memory
+HARMONICS_CACHE_FILES = 64  # number of shapes whose harmonics are kept on disk
+POINTS_CACHE_FILES = 64  # number of parsed shape files kept on disk
+IMAGE_GRID_CELL_SIZE = 16  # in pixels, for the nearest neighbor search in images
+TWO_OPT_WINDOW = 64  # max distance along the tour of edges compared by 2-opt
+TWO_OPT_ROUNDS = 16  # max rounds of moves applied at once by 2-opt
+BENCHMARK_MIN_DIFFERENCE = 0.05  # in milliseconds, smaller slowdowns count as timer noise
@@ -1,112 +1,264 @@
 import math
-import cmath
 
+import numpy
+import numpy.fft
 import pygame
-import pygame.gfxdraw
 
+from src import circle_layer
 from src import constants
+from src import phasors
+from src import profiling
+from src import rotating_circles
+from src import trail
+from src import trail_layer
 from src import transform
 
 
-class Epicycles:
-    def __init__(self, points, n, fade, reverse,
-                 surface_center, debug):
-        self.angular_velocity = constants.DEFAULT_ANGULAR_VELOCITY
-        if reverse:
-            self.angular_velocity *= -1
-        self.velocity_positive = self.angular_velocity > 0
-        self.circles_visible = True
-        self.fade = fade
+class Epicycles(rotating_circles.RotatingCircles):
+    def __init__(self, points, n, fade, reverse, surface_center, debug,
+                 table_size=None,
+                 table_memory=constants.DEFAULT_PATH_TABLE_MEMORY,
+                 harmonics=None, max_error=0, energy=0, incremental=False,
+                 profiler=None, dtype=numpy.complex128):
+        super().__init__(fade, reverse)
+        # If set, the line is kept on a persistent surface when not fading.
+        self.incremental = incremental
+        self.trail_layer = None
+        if profiler is None:
+            profiler = profiling.Profiler()
+        self.profiler = profiler
 
-        self.harmonics, self.circle_radii, offset = transform.transform(points)
+        # The result of transform.transform can be passed in as harmonics
+        # to skip the transformation of the points.
+        if harmonics is None:
+            harmonics = transform.transform(points)
+        self.amplitudes, self.frequencies, offset = harmonics
         if n > 0:
-            self.harmonics = self.harmonics[:n]
-            self.circle_radii = self.circle_radii[:n]
+            self.amplitudes = self.amplitudes[:n]
+            self.frequencies = self.frequencies[:n]
+        if max_error > 0 or energy > 0:
+            all_amplitudes = self.amplitudes
+            all_frequencies = self.frequencies
+            self.amplitudes, self.frequencies = transform.truncate(
+                self.amplitudes,
+                self.frequencies,
+                max_error,
+                energy
+            )
+            if debug:
+                dropped = ~numpy.isin(all_frequencies, self.frequencies)
+                error, rms_error = transform.reconstruction_error(
+                    all_amplitudes[dropped],
+                    all_frequencies[dropped]
+                )
+                print(f"kept {len(self.amplitudes)} of {len(all_amplitudes)} " +
+                      f"harmonics, error: {error:.2f} px (rms {rms_error:.2f} px)")
+
+        # The harmonics, the circle centers, the path table and the line
+        # are stored with this dtype. complex64 halves their memory.
+        self.dtype = numpy.dtype(dtype)
+        self.float_dtype = numpy.empty(0, dtype=self.dtype).real.dtype
+        self.amplitudes = self.amplitudes.astype(self.dtype, copy=False)
+        self.frequencies = self.frequencies.astype(self.dtype, copy=False)
+        # The product of a large angle and a high frequency loses too much
+        # precision in float32. Because all frequencies are integers the
+        # angles can be reduced to [0, tau) first without changing the result.
+        self.reduce_angles = self.float_dtype != numpy.float64
+        self.phasors = phasors.Phasors(self.frequencies)
+
+        # Integer radii of the circles in the same order as the harmonics
+        # because gfxdraw needs integer arguments.
+        self.radii = numpy.abs(self.amplitudes).astype(numpy.int64)
+        self.circle_layer = circle_layer.CircleLayer()
+
+        # The first element holds the offset so that a single cumsum over
+        # this buffer yields all circle centers in the same order of
+        # additions as the original loop.
+        self.terms = numpy.empty(len(self.amplitudes) + 1, dtype=self.dtype)
+        self.terms[0] = complex(*(offset + surface_center))
+        self.circle_centers = self.terms.copy()
+        self.centers_angle = None  # the angle of the current circle centers
+        self.centers_count = 0  # the number of valid circle centers after the first
+
+        # These get changed by set_detail_level.
+        self.detail_level = 0
+        self.max_distance_sq = constants.MAX_DISTANCE_SQ
+        self.circle_radius_cutoff = constants.CIRCLE_RADIUS_CUTOFF
+        self.circle_count = len(self.amplitudes)
 
-        self.circle_centers = [0j] * (len(self.harmonics) + 1)
-        self.circle_centers[0] = complex(*(offset + surface_center))
+        self.path_table = self.build_path_table(table_size, table_memory, debug)
 
         # Add the points twice so the line draw functions don't complain when
         # the app is started in the paused state.
         self.current_angle = 0  # in radians
-        self.angles = [self.current_angle, self.current_angle]
+        self.trail = trail.Trail(dtype=self.dtype)
+        self.trail.decreasing = not self.velocity_positive
         p = self.get_point_at_angle(self.current_angle)
-        self.points = [p, p]
-
-        self.line_colors = []
+        self.trail.append(p, self.current_angle)
+        self.trail.append(p, self.current_angle)
 
         if debug:
-            print(f"{len(self.harmonics)=}")
-            print(f"{len(self.circle_radii)=}")
+            print(f"{len(self.amplitudes)=}")
 
     def update(self, dt):
         self.current_angle += self.angular_velocity * dt
-        previous_point = self.points[-1]
-        next_point = self.get_point_at_angle(self.current_angle)
-        dist_sq = previous_point.distance_squared_to(next_point)
+        previous_point = self.trail.complex_points[-1]
+        with self.profiler.measure("update: evaluate"):
+            next_point = self.get_point_at_angle(self.current_angle)
+        step = next_point - previous_point
+        dist_sq = step.real ** 2 + step.imag ** 2
         if dist_sq < constants.MIN_DISTANCE_SQ:
             return
-        if dist_sq > constants.MAX_DISTANCE_SQ:
-            interpolated_points, interpolated_angles = self.interpolate(
-                previous_point,
-                next_point,
-                self.angles[-1],
-                self.current_angle
-            )
-            for angle in reversed(interpolated_angles):
-                if 0 <= angle < math.tau:
-                    break
-                angle %= math.tau
-            self.points.extend(interpolated_points)
-            self.angles.extend(interpolated_angles)
+        if dist_sq > self.max_distance_sq:
+            with self.profiler.measure("update: interpolate"):
+                interpolated_points, interpolated_angles = self.interpolate(
+                    previous_point,
+                    next_point,
+                    self.trail.angles[-1],
+                    self.current_angle
+                )
+                self.trail.extend(interpolated_points, interpolated_angles)
 
-        self.trim_line()
+        with self.profiler.measure("update: trim"):
+            self.trim_line()
 
-        if self.fade:
-            self.fade_line()
+        self.trail.append(next_point, self.current_angle)
 
-        self.angles.append(self.current_angle)
-        self.points.append(next_point)
+    @property
+    def draws_background(self):
+        """True if draw covers the whole target surface."""
+        return self.incremental and not self.fade
+
+    def draw(self, target_surf, areas=None):
+        """Draw the line and the circles. If draws_background is True,
+        the background gets copied from the trail layer, either only
+        inside the list of areas or everywhere.
+        """
+        with self.profiler.measure("draw: line"):
+            self.draw_line(target_surf, areas)
 
-    def draw(self, target_surf):
-        if self.fade:
-            for i, col in enumerate(self.line_colors):
-                pygame.draw.aaline(
+        if self.circles_visible:
+            with self.profiler.measure("draw: circles"):
+                self.circle_layer.draw(
                     target_surf,
-                    col,
-                    self.points[i],
-                    self.points[i + 1]
+                    self.get_visible_centers(),
+                    self.radii[:self.circle_count],
+                    self.circle_radius_cutoff
+                )
+
+    def draw_line(self, target_surf, areas=None):
+        if self.draws_background:
+            if (self.trail_layer is None
+                    or self.trail_layer.surface.get_size() != target_surf.get_size()):
+                self.trail_layer = trail_layer.TrailLayer(target_surf.get_size())
+            self.trail_layer.update(self.trail)
+            if areas is None:
+                target_surf.blit(self.trail_layer.surface, (0, 0))
+            else:
+                for area in areas:
+                    target_surf.blit(self.trail_layer.surface, area, area)
+        elif self.fade:
+            with self.profiler.measure("draw: fade"):
+                runs = self.fade_line()
+            points = self.trail.points
+            for band, start, end in runs:
+                pygame.draw.aalines(
+                    target_surf,
+                    self.fade_colors[band],
+                    False,
+                    points[start:end + 1]
                 )
         else:
             pygame.draw.aalines(
                 target_surf,
                 constants.LINE_COLOR,
                 False,
-                self.points
+                self.trail.points
             )
 
+    def get_visible_centers(self):
+        """Return the centers of the shown circles at the current angle
+        followed by the tip as an (n, 2) array.
+        """
+        count = self.circle_count
+        if (self.centers_angle != self.current_angle
+                or self.centers_count < count):
+            self.update_circle_centers(self.current_angle, count)
+        end = count + 1
+        if count < len(self.amplitudes):
+            # Connect the last shown circle to the exact tip. The slot
+            # after the valid centers is free for it.
+            tip = self.get_point_at_angle(self.current_angle)
+            self.circle_centers[end] = tip
+            end += 1
+        return self.circle_centers[:end].view(self.float_dtype).reshape(-1, 2)
+
+    def get_bounding_rects(self):
+        """Return rects containing everything that draw
+        paints over the background: the line and the circles.
+        """
+        rects = [transform.bounding_rect(self.trail.points, 0)]
         if self.circles_visible:
-            centers = [transform.complex_to_vec2(cc) for cc in self.circle_centers]
-            for center, radius in zip(centers, self.circle_radii):
-                pygame.gfxdraw.aacircle(
-                    target_surf,
-                    int(center.x),
-                    int(center.y),
-                    radius,
-                    constants.CIRCLE_COLOR
-                )
-            pygame.draw.aalines(
-                target_surf,
-                constants.CIRCLE_COLOR,
-                False,
-                centers
-            )
+            radii = self.radii[:self.circle_count]
+            shown = radii[radii >= self.circle_radius_cutoff]
+            rects.append(transform.bounding_rect(
+                self.get_visible_centers(),
+                shown.max(initial=0)
+            ))
+        return rects
 
-    def get_point_at_angle(self, angle):
-        # FIXME: This function gets called a lot and takes a big chunk of the
-        #  time in a tick. Any way to make it faster? Maybe using numpy
-        #  vectorization?
+    def build_path_table(self, table_size, table_memory, debug):
+        """Precompute the tip positions on an evenly spaced grid of angles.
+
+        Because all angular velocities are integers the path repeats after
+        tau radians and the whole grid is one inverse FFT. If table_size is
+        None it is chosen from the highest frequency. Smaller tables than
+        2 * highest + 1 entries would fold the high frequencies onto low
+        ones, so they are enlarged to that size. Returns None if the
+        table is disabled or would need more than table_memory MiB.
+        """
+        highest = int(numpy.abs(self.frequencies.imag).max(initial=0))
+        if table_size is None:
+            table_size = 1 << (
+                (2 * highest + 1) * constants.PATH_TABLE_OVERSAMPLING - 1
+            ).bit_length()
+        if table_size <= 0:
+            return None
+        if table_size < 2 * highest + 1:
+            if debug:
+                print(f"Path table with {table_size} entries is too small " +
+                      f"for frequency {highest}, using {2 * highest + 1}.")
+            table_size = 2 * highest + 1
+        # One extra element at the end repeats the first one so that
+        # the interpolation does not have to wrap around.
+        table_bytes = (table_size + 1) * self.dtype.itemsize
+        if table_bytes > table_memory * 2 ** 20:
+            if debug:
+                print(f"Path table with {table_size} entries exceeds " +
+                      f"{table_memory} MiB, using exact evaluation.")
+            return None
 
+        spectrum = numpy.zeros(table_size, dtype=numpy.complex128)
+        indices = self.frequencies.imag.astype(numpy.int64) % table_size
+        numpy.add.at(spectrum, indices, self.amplitudes)
+        table = numpy.empty(table_size + 1, dtype=self.dtype)
+        table[:-1] = numpy.fft.ifft(spectrum) * table_size + self.terms[0]
+        table[-1] = table[0]
+        if debug:
+            print(f"path table size: {table_size} ({table_bytes / 2 ** 20:.2f} MiB)")
+        return table
+
+    def lookup_path_table(self, angles):
+        """Linearly interpolate the tip positions from the path table."""
+        table_size = len(self.path_table) - 1
+        position = numpy.mod(angles, math.tau) * (table_size / math.tau)
+        index = numpy.minimum(position.astype(numpy.int64), table_size - 1)
+        fraction = position - index
+        lower = self.path_table[index]
+        return lower + (self.path_table[index + 1] - lower) * fraction
+
+    def update_circle_centers(self, angle, count=None):
+        """Calculate the centers of the first count circles, all by default."""
         # This is the formula:
         # a * exp(b * t) + c
         # a is the amplitude (circle radius)
@@ -114,87 +266,78 @@ class Epicycles:
         # t is the angle
         # c is the position of the circle center
 
-        for i, (a, b) in enumerate(self.harmonics):
-            self.circle_centers[i + 1] = a * cmath.exp(b * angle) + self.circle_centers[i]
-        return transform.complex_to_vec2(self.circle_centers[-1])
+        # All circles are evaluated at once and the centers are the
+        # cumulative sum of the terms. exp(b * t) is advanced by phasor
+        # stepping, only for the circles that are needed.
+        if count is None:
+            count = len(self.amplitudes)
+        terms = self.terms[1:count + 1]
+        numpy.multiply(self.phasors.at(angle, count), self.amplitudes[:count], out=terms)
+        numpy.cumsum(self.terms[:count + 1], out=self.circle_centers[:count + 1])
+        self.centers_angle = angle
+        self.centers_count = count
+
+    def get_point_at_angle(self, angle):
+        if self.path_table is not None:
+            return self.lookup_path_table(numpy.array([angle]))[0]
+        self.update_circle_centers(angle)
+        return self.circle_centers[-1]
+
+    def get_points_at_angles(self, angles):
+        """Return the tip positions at all angles as a complex array.
+
+        This evaluates the same formula as get_point_at_angle but as a
+        matrix product of shape (angles x harmonics) with the amplitudes.
+        Large requests are split into chunks to bound the memory usage.
+        """
+        angles = numpy.asarray(angles, dtype=numpy.float64)
+        if self.path_table is not None:
+            return self.lookup_path_table(angles)
+        if self.reduce_angles:
+            angles = numpy.mod(angles, math.tau).astype(self.float_dtype)
+        result = numpy.empty(len(angles), dtype=self.dtype)
+        chunk_size = max(1, constants.BATCH_SIZE // max(1, len(self.amplitudes)))
+        for start in range(0, len(angles), chunk_size):
+            chunk = angles[start:start + chunk_size]
+            phasors = numpy.exp(numpy.multiply.outer(chunk, self.frequencies))
+            result[start:start + chunk_size] = phasors @ self.amplitudes
+        result += self.terms[0]
+        return result
 
     def interpolate(self, p1, p2, a1, a2):
-        """Add more points in between if two points are too far apart."""
-        mean_angle = (a1 + a2) / 2
-        mean_point = self.get_point_at_angle(mean_angle)
-        result_points = []
-        result_angles = []
-        if p1.distance_squared_to(mean_point) > constants.MAX_DISTANCE_SQ:
-            interp_points, interp_angles = self.interpolate(p1, mean_point,
-                                                            a1, mean_angle)
-            result_points.extend(interp_points)
-            result_angles.extend(interp_angles)
-        result_points.append(mean_point)
-        result_angles.append(mean_angle)
-        if mean_point.distance_squared_to(p2) > constants.MAX_DISTANCE_SQ:
-            interp_points, interp_angles = self.interpolate(mean_point, p2,
-                                                            mean_angle, a2)
-            result_points.extend(interp_points)
-            result_angles.extend(interp_angles)
-        return result_points, result_angles
-
-    def trim_line(self):
-        """Keep the points and angles lists short by
-        removing old points that are more than tau radians behind.
+        """Add more points in between if two points are too far apart.
+
+        Every pass halves all segments that are still too long and evaluates
+        their midpoints in a single batch. The result is the same as
+        bisecting each segment recursively.
         """
-        if self.velocity_positive:
-            limit = self.current_angle - math.tau
-            for i, angle in enumerate(self.angles):
-                if angle > limit:
-                    self.angles = self.angles[i:]
-                    self.points = self.points[i:]
-                    break
-        else:
-            limit = self.current_angle + math.tau
-            for i, angle in enumerate(self.angles):
-                if angle < limit:
-                    self.angles = self.angles[i:]
-                    self.points = self.points[i:]
-                    break
-
-    def rotate_faster(self):
-        self.angular_velocity = min(
-            abs(self.angular_velocity) * 2,
-            constants.MAX_ANGULAR_VELOCITY
-        )
-        if not self.velocity_positive:
-            self.angular_velocity *= -1
-
-    def rotate_slower(self):
-        self.angular_velocity = max(
-            abs(self.angular_velocity) / 2,
-            constants.MIN_ANGULAR_VELOCITY
-        )
-        if not self.velocity_positive:
-            self.angular_velocity *= -1
-
-    def reverse_direction(self):
-        self.angular_velocity *= -1
-        self.velocity_positive = not self.velocity_positive
-        # Erase the line here and reverse the remnant, otherwise it glitches.
+        angles = numpy.array([a1, a2], dtype=numpy.float64)
+        points = numpy.array([p1, p2], dtype=numpy.complex128)
+        while True:
+            steps = numpy.diff(points)
+            dist_sq = steps.real ** 2 + steps.imag ** 2
+            too_far = numpy.flatnonzero(dist_sq > self.max_distance_sq)
+            if len(too_far) == 0:
+                break
+            mean_angles = (angles[too_far] + angles[too_far + 1]) / 2
+            mean_points = self.get_points_at_angles(mean_angles)
+            angles = numpy.insert(angles, too_far + 1, mean_angles)
+            points = numpy.insert(points, too_far + 1, mean_points)
+        return points[1:-1], angles[1:-1]
+
+    def set_detail_level(self, level):
+        """Trade visual detail for speed. Every level doubles the radius of
+        the smallest circle that is drawn and the distance between points
+        before interpolating, and halves the number of circles shown.
+        The position of the tip stays exact.
+        """
+        self.detail_level = level
+        self.max_distance_sq = constants.MAX_DISTANCE_SQ * 4 ** level
+        self.circle_radius_cutoff = constants.CIRCLE_RADIUS_CUTOFF * 2 ** level
+        self.circle_count = len(self.amplitudes) >> level
+
+    def set_angle(self, angle):
+        """Jump to angle and start a new line there."""
+        self.current_angle = angle
+        self.trail.append(self.get_point_at_angle(angle), angle)
         self.erase_line()
-        self.points.reverse()
-        self.angles.reverse()
-        self.line_colors.reverse()
-
-    def erase_line(self):
-        # Keep the last two points so the draw functions don't complain.
-        self.points = self.points[-2:]
-        self.angles = self.angles[-2:]
-        # Colors list length must be one less than points and angles.
-        self.line_colors = self.line_colors[-1:]
-
-    def fade_line(self):
-        self.line_colors = []
-        for angle in self.angles:
-            self.line_colors.append(
-                constants.LINE_COLOR.lerp(
-                    constants.BACKGROUND_COLOR,
-                    abs(self.current_angle - angle) / math.tau
-                )
-            )
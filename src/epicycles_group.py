@@ -0,0 +1,217 @@
+import numpy
+import pygame
+
+from src import circle_layer
+from src import constants
+from src import phasors
+from src import profiling
+from src import rotating_circles
+from src import trail
+from src import transform
+
+
+class EpicyclesGroup(rotating_circles.RotatingCircles):
+    """Many shapes drawn by circles which all turn at the same speed.
+
+    The harmonics of all shapes are packed into one array, so the circles
+    of all shapes are evaluated with a few numpy calls per frame instead
+    of one Epicycles instance per shape. All lines share the same angles
+    and are kept in one trail with a row per shape.
+    """
+
+    def __init__(self, harmonics_list, surface_centers, n, fade, reverse,
+                 max_error=0, energy=0, profiler=None):
+        super().__init__(fade, reverse)
+        if profiler is None:
+            profiler = profiling.Profiler()
+        self.profiler = profiler
+
+        amplitudes = []
+        frequencies = []
+        offsets = []
+        for (shape_amplitudes, shape_frequencies, offset), center in zip(
+                harmonics_list, surface_centers):
+            if n > 0:
+                shape_amplitudes = shape_amplitudes[:n]
+                shape_frequencies = shape_frequencies[:n]
+            if max_error > 0 or energy > 0:
+                shape_amplitudes, shape_frequencies = transform.truncate(
+                    shape_amplitudes,
+                    shape_frequencies,
+                    max_error,
+                    energy
+                )
+            amplitudes.append(shape_amplitudes)
+            frequencies.append(shape_frequencies)
+            offsets.append(complex(*(offset + center)))
+        self.shape_count = len(offsets)
+        self.counts = numpy.array([len(a) for a in amplitudes], dtype=numpy.int64)
+        self.amplitudes = numpy.concatenate(amplitudes)
+        self.frequencies = numpy.concatenate(frequencies)
+        self.radii = numpy.abs(self.amplitudes).astype(numpy.int64)
+        self.phasors = phasors.Phasors(self.frequencies)
+        self.circle_layer = circle_layer.CircleLayer()
+
+        # Every shape occupies its offset followed by its terms in the
+        # buffer, so one cumsum yields the circle centers of all shapes.
+        # The sums of the previous shapes get subtracted afterwards.
+        self.offset_slots = numpy.concatenate(([0], numpy.cumsum(self.counts + 1)[:-1]))
+        self.tip_slots = self.offset_slots + self.counts
+        self.term_slots = numpy.flatnonzero(
+            ~numpy.isin(numpy.arange(len(self.amplitudes) + self.shape_count),
+                        self.offset_slots)
+        )
+        self.terms = numpy.empty(len(self.amplitudes) + self.shape_count,
+                                 dtype=numpy.complex128)
+        self.terms[self.offset_slots] = offsets
+        self.circle_centers = self.terms.copy()
+        self.centers_angle = None
+        # Index of the harmonic of every term for the batched evaluation.
+        self.harmonic_starts = self.offset_slots - numpy.arange(self.shape_count)
+
+        # These get changed by set_detail_level.
+        self.detail_level = 0
+        self.max_distance_sq = constants.MAX_DISTANCE_SQ
+        self.circle_radius_cutoff = constants.CIRCLE_RADIUS_CUTOFF
+        self.circle_counts = self.counts
+
+        self.current_angle = 0  # in radians
+        self.trail = trail.Trail(width=self.shape_count)
+        self.trail.decreasing = not self.velocity_positive
+        points = self.get_points_at_angle(self.current_angle)
+        self.trail.append(points, self.current_angle)
+        self.trail.append(points, self.current_angle)
+
+    def update(self, dt):
+        self.current_angle += self.angular_velocity * dt
+        previous_points = self.trail.complex_points[:, -1]
+        with self.profiler.measure("update: evaluate"):
+            next_points = self.get_points_at_angle(self.current_angle)
+        # The shapes share the angles of their points, so a new point is
+        # added as soon as the tip of any shape moved far enough.
+        steps = next_points - previous_points
+        dist_sq = (steps.real ** 2 + steps.imag ** 2).max(initial=0)
+        if dist_sq < constants.MIN_DISTANCE_SQ:
+            return
+        if dist_sq > self.max_distance_sq:
+            with self.profiler.measure("update: interpolate"):
+                interpolated_points, interpolated_angles = self.interpolate(
+                    previous_points,
+                    next_points,
+                    self.trail.angles[-1],
+                    self.current_angle
+                )
+                self.trail.extend(interpolated_points, interpolated_angles)
+
+        with self.profiler.measure("update: trim"):
+            self.trim_line()
+
+        self.trail.append(next_points, self.current_angle)
+
+    def draw(self, target_surf):
+        with self.profiler.measure("draw: line"):
+            if self.fade:
+                runs = self.fade_line()
+                for row in range(self.shape_count):
+                    points = self.trail.line_points(row)
+                    for band, start, end in runs:
+                        pygame.draw.aalines(
+                            target_surf,
+                            self.fade_colors[band],
+                            False,
+                            points[start:end + 1]
+                        )
+            else:
+                for row in range(self.shape_count):
+                    pygame.draw.aalines(
+                        target_surf,
+                        constants.LINE_COLOR,
+                        False,
+                        self.trail.line_points(row)
+                    )
+
+        if self.circles_visible:
+            with self.profiler.measure("draw: circles"):
+                if self.centers_angle != self.current_angle:
+                    self.update_circle_centers(self.current_angle)
+                centers = self.circle_centers.view(numpy.float64).reshape(-1, 2)
+                for row, count in enumerate(self.circle_counts.tolist()):
+                    start = self.offset_slots[row]
+                    shape_centers = centers[start:start + count + 1]
+                    if count < self.counts[row]:
+                        # Connect the last shown circle to the exact tip.
+                        shape_centers = numpy.concatenate(
+                            (shape_centers, centers[self.tip_slots[row], numpy.newaxis])
+                        )
+                    harmonic_start = self.harmonic_starts[row]
+                    self.circle_layer.draw(
+                        target_surf,
+                        shape_centers,
+                        self.radii[harmonic_start:harmonic_start + count],
+                        self.circle_radius_cutoff
+                    )
+
+    def update_circle_centers(self, angle):
+        """Calculate the circle centers of all shapes. The centers of a
+        shape start at its offset slot and end with the tip.
+        """
+        self.terms[self.term_slots] = self.phasors.at(angle) * self.amplitudes
+        numpy.cumsum(self.terms, out=self.circle_centers)
+        previous_sums = numpy.zeros(self.shape_count, dtype=numpy.complex128)
+        previous_sums[1:] = self.circle_centers[self.tip_slots[:-1]]
+        self.circle_centers -= numpy.repeat(previous_sums, self.counts + 1)
+        self.centers_angle = angle
+
+    def get_points_at_angle(self, angle):
+        """Return the tips of all shapes at angle."""
+        if self.centers_angle != angle:
+            self.update_circle_centers(angle)
+        return self.circle_centers[self.tip_slots]
+
+    def get_points_at_angles(self, angles):
+        """Return the tips of all shapes at all angles as a
+        (shapes x angles) complex array, like Epicycles.get_points_at_angles.
+        """
+        angles = numpy.asarray(angles, dtype=numpy.float64)
+        result = numpy.empty((self.shape_count, len(angles)), dtype=numpy.complex128)
+        chunk_size = max(1, constants.BATCH_SIZE // max(1, len(self.amplitudes)))
+        ends = self.harmonic_starts + self.counts
+        for start in range(0, len(angles), chunk_size):
+            chunk = angles[start:start + chunk_size]
+            terms = numpy.exp(numpy.multiply.outer(chunk, self.frequencies))
+            terms *= self.amplitudes
+            # The sum of every shape is the difference of the cumulative
+            # sums at its ends, which also works for shapes without terms.
+            sums = numpy.zeros((len(chunk), len(self.amplitudes) + 1),
+                               dtype=numpy.complex128)
+            numpy.cumsum(terms, axis=1, out=sums[:, 1:])
+            result[:, start:start + chunk_size] = (
+                sums[:, ends] - sums[:, self.harmonic_starts]
+            ).T
+        result += self.terms[self.offset_slots, numpy.newaxis]
+        return result
+
+    def interpolate(self, p1, p2, a1, a2):
+        """Add more points in between while the tip of any shape moves too
+        far, like Epicycles.interpolate. p1 and p2 are the tips of all shapes.
+        """
+        angles = numpy.array([a1, a2], dtype=numpy.float64)
+        points = numpy.column_stack((p1, p2))
+        while True:
+            steps = numpy.diff(points, axis=1)
+            dist_sq = (steps.real ** 2 + steps.imag ** 2).max(axis=0)
+            too_far = numpy.flatnonzero(dist_sq > self.max_distance_sq)
+            if len(too_far) == 0:
+                break
+            mean_angles = (angles[too_far] + angles[too_far + 1]) / 2
+            mean_points = self.get_points_at_angles(mean_angles)
+            angles = numpy.insert(angles, too_far + 1, mean_angles)
+            points = numpy.insert(points, too_far + 1, mean_points, axis=1)
+        return points[:, 1:-1], angles[1:-1]
+
+    def set_detail_level(self, level):
+        """Like Epicycles.set_detail_level for every shape."""
+        self.detail_level = level
+        self.max_distance_sq = constants.MAX_DISTANCE_SQ * 4 ** level
+        self.circle_radius_cutoff = constants.CIRCLE_RADIUS_CUTOFF * 2 ** level
+        self.circle_counts = self.counts >> level
@@ -0,0 +1,193 @@
+import concurrent.futures
+import math
+import os
+import shutil
+import subprocess
+import time
+
+import numpy
+import pygame
+
+from src import constants
+from src import epicycles
+from src import harmonics_cache
+from src import shape_loader
+
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".mov", ".avi")
+
+
+def export(filename, output, n, scale, fade, reverse, window_size,
+           frames, debug, table_size=None,
+           table_memory=constants.DEFAULT_PATH_TABLE_MEMORY, jobs=1,
+           two_opt=False, resample_count=0, tolerance=0,
+           max_error=0, energy=0, single_precision=False):
+    """Render the shape without opening a window.
+
+    The app is advanced by a fixed dt of 1 / FPS per frame as fast as
+    possible. If output ends with a video extension the frames are piped to
+    ffmpeg, otherwise they are saved as numbered PNG files in the directory
+    output. If frames is 0 one full cycle is rendered. With more than one
+    job the frames are rendered in parallel processes.
+    """
+    target_surface_rect = pygame.Rect((0, 0), window_size)
+    points = shape_loader.load(filename, scale, target_surface_rect,
+                               two_opt, resample_count, tolerance)
+    harmonics = harmonics_cache.get(points)
+    options = {
+        "n": n,
+        "fade": fade,
+        "reverse": reverse,
+        "window_size": window_size,
+        "table_size": table_size,
+        "table_memory": table_memory,
+        "max_error": max_error,
+        "energy": energy,
+        "dtype": numpy.complex64 if single_precision else numpy.complex128
+    }
+    if frames <= 0:
+        frames = frames_per_cycle() + 1
+
+    is_video = output.lower().endswith(VIDEO_EXTENSIONS)
+    writer = open_writer(output, window_size)
+    start_time = time.perf_counter()
+    try:
+        if jobs > 1:
+            render_parallel(harmonics, options, frames, jobs,
+                            None if is_video else output, writer)
+        else:
+            render(harmonics, options, 0, frames, writer, debug)
+    finally:
+        writer(None, None)
+    elapsed = time.perf_counter() - start_time
+    print(f"Rendered {frames} frames in {elapsed:.2f} s " +
+          f"({frames / elapsed:.1f} fps).")
+
+
+def frames_per_cycle():
+    dt = 1 / constants.FPS
+    return math.ceil(math.tau / (constants.DEFAULT_ANGULAR_VELOCITY * dt))
+
+
+def render(harmonics, options, first, last, write, debug=False):
+    """Render the frames from first up to but excluding last.
+
+    Frame i shows the state after i updates. Every frame only depends on
+    the line of the previous cycle, so rendering starts one cycle before
+    first without drawing to rebuild it.
+    """
+    surface = pygame.Surface(options["window_size"])
+    epi = epicycles.Epicycles(
+        points=None,
+        n=options["n"],
+        fade=options["fade"],
+        reverse=options["reverse"],
+        surface_center=surface.get_rect().center,
+        debug=debug,
+        table_size=options["table_size"],
+        table_memory=options["table_memory"],
+        harmonics=harmonics,
+        max_error=options["max_error"],
+        energy=options["energy"],
+        dtype=options["dtype"]
+    )
+    # Evaluate the circles exactly in every frame. The rounding errors of
+    # phasor stepping depend on the frame where it started, which would
+    # make the frames of parallel chunks differ in single precision.
+    epi.phasors.renormalize_interval = 0
+    dt = 1 / constants.FPS
+    warm_up_start = max(0, first - frames_per_cycle())
+    if warm_up_start > 0:
+        epi.set_angle(warm_up_start * epi.angular_velocity * dt)
+    for i in range(warm_up_start, last):
+        if i > warm_up_start:
+            epi.update(dt)
+        if i >= first:
+            surface.fill(constants.BACKGROUND_COLOR)
+            epi.draw(surface)
+            write(i, surface)
+
+
+def render_chunk(job):
+    """Worker function for render_parallel. PNG files are saved directly,
+    video frames are returned as raw RGB data.
+    """
+    harmonics, options, first, last, directory = job
+    frames = []
+    if directory is None:
+        def write(frame, surface):
+            frames.append(pygame.image.tobytes(surface, "RGB"))
+    else:
+        write = png_writer(directory)
+    render(harmonics, options, first, last, write)
+    return frames
+
+
+def render_parallel(harmonics, options, frames, jobs, directory, write):
+    """Split the frames into chunks and render them in a process pool.
+    The chunks are collected in order and their frames passed to write.
+    """
+    chunk_size = math.ceil(frames / jobs)
+    if directory is None:
+        # Bound the memory used by rendered video frames waiting to be written.
+        chunk_size = min(chunk_size, constants.EXPORT_CHUNK_FRAMES)
+    chunks = [
+        (harmonics, options, first, min(first + chunk_size, frames), directory)
+        for first in range(0, frames, chunk_size)
+    ]
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        for (_, _, first, _, _), data in zip(
+                chunks, executor.map(render_chunk, chunks)):
+            for i, frame in enumerate(data):
+                write(first + i, frame)
+
+
+def png_writer(directory):
+    def write_png(frame, surface):
+        if frame is not None:
+            pygame.image.save(
+                surface,
+                os.path.join(directory, f"frame_{frame:06}.png")
+            )
+
+    return write_png
+
+
+def open_writer(output, window_size):
+    """Return a function that takes the frame number and the surface or its
+    raw RGB data. Calling it with None as the frame number finishes the output.
+    """
+    if output.lower().endswith(VIDEO_EXTENSIONS):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise FileNotFoundError(
+                "ffmpeg is required for video export. Export to a directory " +
+                "to get PNG files instead."
+            )
+        process = subprocess.Popen(
+            [
+                ffmpeg, "-loglevel", "error", "-y",
+                "-f", "rawvideo",
+                "-pix_fmt", "rgb24",
+                "-s", f"{window_size[0]}x{window_size[1]}",
+                "-r", str(constants.FPS),
+                "-i", "-",
+                "-pix_fmt", "yuv420p",
+                output
+            ],
+            stdin=subprocess.PIPE
+        )
+
+        def write_video(frame, surface):
+            if frame is None:
+                process.stdin.close()
+                process.wait()
+            elif isinstance(surface, bytes):
+                process.stdin.write(surface)
+            else:
+                process.stdin.write(pygame.image.tobytes(surface, "RGB"))
+
+        return write_video
+
+    os.makedirs(output, exist_ok=True)
+    return png_writer(output)
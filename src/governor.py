@@ -0,0 +1,39 @@
+from src import constants
+
+
+class Governor:
+    """Choose a level of detail that keeps the time spent in update and
+    draw within the frame budget.
+
+    The frame times are smoothed with an exponential moving average. The
+    level goes up when the average is over the budget and back down when
+    there is enough headroom. After every change the level is held for a
+    while so that the average can catch up.
+    """
+
+    def __init__(self, budget=constants.GOVERNOR_BUDGET):
+        self.budget = budget
+        self.level = 0
+        self.average_frame_time = 0
+        self.cooldown = constants.GOVERNOR_COOLDOWN_FRAMES
+
+    def add_frame_time(self, frame_time):
+        """Record the time in seconds of one frame and return
+        True if the level changed.
+        """
+        self.average_frame_time += (
+            (frame_time - self.average_frame_time) * constants.GOVERNOR_SMOOTHING
+        )
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+        if (self.average_frame_time > self.budget
+                and self.level < constants.GOVERNOR_MAX_LEVEL):
+            self.level += 1
+        elif (self.average_frame_time < self.budget * constants.GOVERNOR_HEADROOM
+                and self.level > 0):
+            self.level -= 1
+        else:
+            return False
+        self.cooldown = constants.GOVERNOR_COOLDOWN_FRAMES
+        return True
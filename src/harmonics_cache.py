@@ -0,0 +1,105 @@
+import collections
+import glob
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy
+import pygame
+
+from src import constants
+from src import transform
+
+
+# Most recently used harmonics at the end.
+_memory_cache = collections.OrderedDict()
+# What numpy.load raises for missing, truncated or otherwise broken files.
+LOAD_ERRORS = (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile)
+
+
+def get(points):
+    """Return transform.transform(points) from the cache if possible.
+
+    The results are kept in memory for the last few shapes and saved in the
+    cache directory for more of them. They are keyed by a hash of the points
+    and the cutoff constant that influences the result.
+    """
+    key = make_key(points)
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    cache_file = os.path.join(constants.CACHE_DIRECTORY, f"harmonics_{key}.npz")
+    harmonics = None
+    try:
+        with numpy.load(cache_file) as cached:
+            harmonics = (
+                cached["amplitudes"],
+                cached["frequencies"],
+                pygame.Vector2(*cached["offset"])
+            )
+        # The modification time orders the files by their last use.
+        os.utime(cache_file)
+    except LOAD_ERRORS:
+        pass
+
+    if harmonics is None:
+        harmonics = transform.transform(points)
+        amplitudes, frequencies, offset = harmonics
+        try:
+            save(
+                cache_file,
+                amplitudes=amplitudes,
+                frequencies=frequencies,
+                offset=numpy.array(offset)
+            )
+            prune_directory("harmonics_*.npz")
+        except OSError:
+            pass  # The cache is optional.
+
+    _memory_cache[key] = harmonics
+    if len(_memory_cache) > constants.HARMONICS_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return harmonics
+
+
+def save(cache_file, **arrays):
+    """Save the arrays with numpy.savez to a temporary file first and move
+    it into place, so that an interrupted run or another instance of the
+    app never leaves a partially written cache file behind.
+    """
+    os.makedirs(constants.CACHE_DIRECTORY, exist_ok=True)
+    file_descriptor, temporary_file = tempfile.mkstemp(
+        suffix=".tmp", dir=constants.CACHE_DIRECTORY
+    )
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            numpy.savez(file, **arrays)
+        os.replace(temporary_file, cache_file)
+    except BaseException:
+        os.remove(temporary_file)
+        raise
+
+
+def prune_directory(pattern, max_files=constants.HARMONICS_CACHE_FILES):
+    """Delete the least recently used cache files
+    matching pattern beyond max_files.
+    """
+    files = glob.glob(os.path.join(constants.CACHE_DIRECTORY, pattern))
+    if len(files) <= max_files:
+        return
+    files.sort(key=os.path.getmtime)
+    for filename in files[:len(files) - max_files]:
+        try:
+            os.remove(filename)
+        except OSError:
+            pass  # Maybe another instance of the app removed it.
+
+
+def make_key(points):
+    points = numpy.ascontiguousarray(points, dtype=numpy.float64)
+    key = hashlib.sha1(points.tobytes())
+    key.update(str(points.shape).encode())
+    key.update(repr(constants.HARMONICS_RADIUS_CUTOFF).encode())
+    return key.hexdigest()
@@ -1,5 +1,144 @@
-# TODO: Load an image file. Ideally the path should be a single pixel wide
-#  and must be of a single color. Construct the point list either by using
-#  nearest neighbor search or try finding the shortest path using
-#  a travelling salesman approach.
-# Return the sorted list of coordinates.
+import numpy
+import pygame
+import pygame.surfarray
+
+from src import constants
+
+
+# Offsets of the neighboring pixels, the direct ones first because
+# they are closer than the diagonal ones.
+NEIGHBORS = ((1, 0), (0, 1), (-1, 0), (0, -1),
+             (1, 1), (-1, 1), (-1, -1), (1, -1))
+
+
+def load(filename, two_opt=False):
+    """Load the path from an image file.
+
+    The path should be a single pixel wide and must be of a single color.
+    The most common color is treated as the background and the path is made
+    of the pixels of the second most common color. Returns the pixel
+    coordinates as an (n, 2) array ordered into a closed tour.
+    """
+    surface = pygame.image.load(filename)
+    rgb = pygame.surfarray.array3d(surface).astype(numpy.int32)
+    colors = (rgb[:, :, 0] << 16) | (rgb[:, :, 1] << 8) | rgb[:, :, 2]
+    unique_colors, counts = numpy.unique(colors, return_counts=True)
+    if len(unique_colors) < 2:
+        raise ValueError(f"\"{filename}\" contains no path.")
+    path_color = unique_colors[numpy.argsort(counts)[-2]]
+    # surfarray is indexed by x first.
+    points = numpy.argwhere(colors == path_color)
+    tour = nearest_neighbor_tour(points)
+    if two_opt:
+        tour = improve_tour(points, tour)
+    return points[tour].astype(numpy.float64)
+
+
+def nearest_neighbor_tour(points):
+    """Return the order of the points when always walking to the nearest
+    unvisited point.
+
+    Most of the time the nearest point is one of the eight neighboring
+    pixels which are looked up in a set. Otherwise the points are searched
+    in rings of grid cells around the current one until no closer point
+    can exist.
+    """
+    cell_size = constants.IMAGE_GRID_CELL_SIZE
+    coordinates = [tuple(p) for p in points.tolist()]
+    index_of = {p: i for i, p in enumerate(coordinates)}
+    remaining = set(coordinates)
+    grid = {}
+    for x, y in coordinates:
+        grid.setdefault((x // cell_size, y // cell_size), set()).add((x, y))
+
+    def visit(point):
+        remaining.discard(point)
+        cell_key = (point[0] // cell_size, point[1] // cell_size)
+        cell = grid[cell_key]
+        cell.discard(point)
+        if not cell:
+            del grid[cell_key]
+
+    current = coordinates[0]
+    visit(current)
+    tour = [index_of[current]]
+    while remaining:
+        x, y = current
+        for dx, dy in NEIGHBORS:
+            neighbor = (x + dx, y + dy)
+            if neighbor in remaining:
+                current = neighbor
+                break
+        else:
+            current = search_grid(grid, current, cell_size)
+        visit(current)
+        tour.append(index_of[current])
+    return numpy.array(tour)
+
+
+def search_grid(grid, point, cell_size):
+    """Find the point in the grid closest to point."""
+    x, y = point
+    cell_x = x // cell_size
+    cell_y = y // cell_size
+    best = None
+    best_dist_sq = float("inf")
+    ring = 0
+    while True:
+        for cx in range(cell_x - ring, cell_x + ring + 1):
+            for cy in range(cell_y - ring, cell_y + ring + 1):
+                if max(abs(cx - cell_x), abs(cy - cell_y)) != ring:
+                    continue
+                for candidate in grid.get((cx, cy), ()):
+                    dist_sq = (candidate[0] - x) ** 2 + (candidate[1] - y) ** 2
+                    if dist_sq < best_dist_sq:
+                        best = candidate
+                        best_dist_sq = dist_sq
+        # Points in the next ring are at least this far away.
+        if best is not None and best_dist_sq <= (ring * cell_size) ** 2:
+            return best
+        ring += 1
+
+
+def improve_tour(points, tour):
+    """Remove crossings from the tour with the 2-opt heuristic.
+
+    To keep it fast only pairs of edges that are at most
+    TWO_OPT_WINDOW steps apart along the tour are compared. Every round
+    finds the best move for all edges at once and then applies the moves
+    whose stretches of the tour don't overlap. Moves that overlap one
+    already applied are found again in the next round.
+    """
+    tour = tour.copy()
+    n = len(tour)
+    complex_points = points[:, 0] + 1j * points[:, 1]
+    for _ in range(constants.TWO_OPT_ROUNDS):
+        # Edge k goes from ordered[k] to following[k].
+        ordered = complex_points[tour]
+        following = numpy.roll(ordered, -1)
+        edge_lengths = numpy.abs(following - ordered)
+        best_gain = numpy.zeros(n)
+        best_j = numpy.zeros(n, dtype=numpy.int64)
+        # Compare every edge i with the edge j = i + offset at once.
+        for offset in range(2, min(constants.TWO_OPT_WINDOW + 2, n)):
+            count = n - offset
+            gain = (
+                edge_lengths[:count] + edge_lengths[offset:]
+                - numpy.abs(ordered[:count] - ordered[offset:])
+                - numpy.abs(following[:count] - following[offset:])
+            )
+            better = gain > best_gain[:count]
+            best_gain[:count][better] = gain[better]
+            best_j[:count][better] = offset
+        moves_i = numpy.flatnonzero(best_gain > 1e-9)
+        if len(moves_i) == 0:
+            break
+        moves_j = moves_i + best_j[moves_i]
+        # A move replaces the edges i and j and reverses the points in
+        # between, so moves starting at or after the last end are independent.
+        end = 0
+        for i, j in zip(moves_i.tolist(), moves_j.tolist()):
+            if i >= end:
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                end = j + 1
+    return tour
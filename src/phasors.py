@@ -0,0 +1,76 @@
+import collections
+import math
+
+import numpy
+
+from src import constants
+
+
+class Phasors:
+    """Calculate exp(frequencies * angle) for a sequence of angles.
+
+    The phasors are advanced from the previous angle by multiplying them
+    with the factors exp(frequencies * step). The factors of the last few
+    distinct steps are cached because the step usually alternates between
+    a few values, e.g. 16 and 17 ms at 60 FPS. A new step costs one exp
+    for its factors. To bound the rounding errors that accumulate by
+    stepping, the phasors are evaluated exactly again after every
+    renormalize_interval steps.
+    """
+
+    def __init__(self, frequencies,
+                 renormalize_interval=constants.PHASOR_RENORMALIZE_INTERVAL,
+                 cache_size=constants.PHASOR_STEP_CACHE_SIZE):
+        self.frequencies = frequencies
+        self.renormalize_interval = renormalize_interval
+        self.cache_size = cache_size
+        # Reduce the angles in single precision, see Epicycles.reduce_angles.
+        self.reduce_angles = frequencies.real.dtype != numpy.float64
+        self.values = numpy.empty_like(frequencies)
+        # step -> factors, most recently used at the end
+        self.step_factors = collections.OrderedDict()
+        self.angle = None
+        self.count = 0  # the number of valid values at the front
+        self.steps_left = 0  # until the next exact evaluation
+
+    def at(self, angle, count=None):
+        """Return the first count phasors at angle, all by default.
+        The array is reused by later calls.
+        """
+        if count is None:
+            count = len(self.frequencies)
+        if self.angle is not None and count <= self.count:
+            if angle == self.angle:
+                return self.values[:count]
+            if self.steps_left > 0:
+                values = self.values[:count]
+                values *= self.get_step_factors(angle - self.angle)[:count]
+                self.angle = angle
+                self.count = count
+                self.steps_left -= 1
+                return values
+        self.evaluate(angle, count)
+        return self.values[:count]
+
+    def get_step_factors(self, step):
+        for cached_step, factors in self.step_factors.items():
+            if abs(step - cached_step) <= constants.PHASOR_STEP_TOLERANCE:
+                self.step_factors.move_to_end(cached_step)
+                return factors
+        factors = numpy.exp(self.frequencies * step)
+        self.step_factors[step] = factors
+        if len(self.step_factors) > self.cache_size:
+            self.step_factors.popitem(last=False)
+        return factors
+
+    def evaluate(self, angle, count):
+        values = self.values[:count]
+        numpy.multiply(
+            self.frequencies[:count],
+            angle % math.tau if self.reduce_angles else angle,
+            out=values
+        )
+        numpy.exp(values, out=values)
+        self.angle = angle
+        self.count = count
+        self.steps_left = self.renormalize_interval
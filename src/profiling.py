@@ -0,0 +1,171 @@
+import cProfile
+import collections
+import contextlib
+import csv
+import time
+
+import numpy
+
+from src import constants
+
+
+NO_OP = contextlib.nullcontext()
+
+
+class Profiler:
+    """Measure how long the named stages of every frame take.
+
+    Stages are measured with "with profiler.measure(name):" and a frame
+    is closed with end_frame. The last window frames are kept for the
+    statistics and every frame is passed on to the hooks. While disabled
+    measure returns a shared context manager that does nothing, so the
+    instrumentation can stay in place.
+    """
+
+    def __init__(self, window=constants.PROFILER_WINDOW):
+        self.enabled = False
+        self.window = window
+        self.samples = {}  # stage name -> deque of the last durations in seconds
+        self.hooks = []
+        self.frame_number = 0
+        self.frame_start = None
+        self.durations = {}  # of the stages in the current frame
+        self.measurements = {}
+
+    def measure(self, stage):
+        if not self.enabled:
+            return NO_OP
+        measurement = self.measurements.get(stage)
+        if measurement is None:
+            measurement = self.measurements[stage] = Measurement(self, stage)
+        return measurement
+
+    def start_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Record the durations of the stages measured since start_frame
+        and the whole frame as the stage "frame".
+        """
+        if not self.enabled or self.frame_start is None:
+            return
+        self.durations["frame"] = time.perf_counter() - self.frame_start
+        for stage, duration in self.durations.items():
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = collections.deque(maxlen=self.window)
+            samples.append(duration)
+        for hook in self.hooks:
+            hook.add_frame(self.frame_number, self.durations)
+        self.frame_number += 1
+        self.frame_start = None
+        self.durations = {}
+
+    def statistics(self, stage):
+        """Return the mean, 95th and 99th percentile of
+        the recent durations of the stage in milliseconds.
+        """
+        samples = numpy.array(self.samples.get(stage, ()), dtype=numpy.float64)
+        if len(samples) == 0:
+            return 0, 0, 0
+        p95, p99 = numpy.percentile(samples, (95, 99)) * 1000
+        return samples.mean() * 1000, p95, p99
+
+    def add_hook(self, hook):
+        """Pass every frame to hook.add_frame(frame_number, durations)
+        and call hook.close() when the profiler gets closed.
+        """
+        self.hooks.append(hook)
+
+    def close(self):
+        for hook in self.hooks:
+            hook.close()
+        self.hooks = []
+
+
+class StartupTimer:
+    """Record how long the steps from the start of the
+    program until the first frame take.
+    """
+
+    def __init__(self, start_time=None):
+        if start_time is None:
+            start_time = time.perf_counter()
+        self.start_time = start_time
+        self.last_time = start_time
+        self.steps = []
+        self.finished = False
+
+    def mark(self, step):
+        """Record the time since the previous step as the duration of step."""
+        if self.finished:
+            return
+        now = time.perf_counter()
+        self.steps.append((step, now - self.last_time))
+        self.last_time = now
+
+    def finish(self):
+        self.mark("first frame")
+        self.finished = True
+
+    def report(self):
+        lines = [f"{step}: {duration * 1000:.1f} ms" for step, duration in self.steps]
+        lines.append(f"startup: {(self.last_time - self.start_time) * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+class Measurement:
+    __slots__ = ("profiler", "stage", "start")
+
+    def __init__(self, profiler, stage):
+        self.profiler = profiler
+        self.stage = stage
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        durations = self.profiler.durations
+        durations[self.stage] = (
+            durations.get(self.stage, 0) + time.perf_counter() - self.start
+        )
+
+
+class CsvHook:
+    """Write the durations of the stages of every frame in
+    milliseconds to a CSV file, one row per stage.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(("frame", "stage", "milliseconds"))
+
+    def add_frame(self, frame_number, durations):
+        self.writer.writerows(
+            (frame_number, stage, f"{duration * 1000:.4f}")
+            for stage, duration in durations.items()
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class CProfileHook:
+    """Run cProfile from creation until close and dump the
+    statistics to a file that can be read with pstats.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def add_frame(self, frame_number, durations):
+        pass
+
+    def close(self):
+        self.profile.disable()
+        self.profile.dump_stats(self.filename)
@@ -0,0 +1,84 @@
+import math
+
+import numpy
+
+from src import constants
+
+
+class RotatingCircles:
+    """The speed and direction of circles and the line they trace.
+
+    Base class of Epicycles and EpicyclesGroup. Subclasses keep the
+    line in self.trail and the angle in self.current_angle.
+    """
+
+    def __init__(self, fade, reverse):
+        self.angular_velocity = constants.DEFAULT_ANGULAR_VELOCITY
+        if reverse:
+            self.angular_velocity *= -1
+        self.velocity_positive = self.angular_velocity > 0
+        self.circles_visible = True
+        self.fade = fade
+
+        # The fading line is drawn in bands of equal color.
+        self.fade_colors = [
+            constants.LINE_COLOR.lerp(
+                constants.BACKGROUND_COLOR,
+                (band + 0.5) / constants.FADE_BANDS
+            )
+            for band in range(constants.FADE_BANDS)
+        ]
+
+    def trim_line(self):
+        """Keep the line short by removing old points
+        that are more than tau radians behind.
+        """
+        if self.velocity_positive:
+            self.trail.trim(self.current_angle - math.tau)
+        else:
+            self.trail.trim(self.current_angle + math.tau)
+
+    def rotate_faster(self):
+        self.angular_velocity = min(
+            abs(self.angular_velocity) * 2,
+            constants.MAX_ANGULAR_VELOCITY
+        )
+        if not self.velocity_positive:
+            self.angular_velocity *= -1
+
+    def rotate_slower(self):
+        self.angular_velocity = max(
+            abs(self.angular_velocity) / 2,
+            constants.MIN_ANGULAR_VELOCITY
+        )
+        if not self.velocity_positive:
+            self.angular_velocity *= -1
+
+    def reverse_direction(self):
+        self.angular_velocity *= -1
+        self.velocity_positive = not self.velocity_positive
+        # Erase the line here, otherwise it glitches. The remnant is a
+        # single point so the angles stay monotonic in the new direction.
+        self.erase_line()
+        self.trail.decreasing = not self.velocity_positive
+
+    def erase_line(self):
+        self.trail.erase()
+
+    def fade_line(self):
+        """Split the line into runs of segments with the same color band.
+
+        Returns a list of (band, start, end) tuples where the segments from
+        point start to point end get drawn in fade_colors[band]. The age of
+        the points is monotonic along the line so each band is one run.
+        All lines of a trail with several rows share the runs.
+        """
+        # Segment i connects point i and i + 1 and is colored by the
+        # age of point i.
+        ages = numpy.abs(self.current_angle - self.trail.angles[:-1])
+        bands = (ages * (constants.FADE_BANDS / math.tau)).astype(numpy.int64)
+        numpy.clip(bands, 0, constants.FADE_BANDS - 1, out=bands)
+        starts = numpy.flatnonzero(numpy.diff(bands)) + 1
+        starts = [0] + starts.tolist()
+        ends = starts[1:] + [len(bands)]
+        return [(bands[start], start, end) for start, end in zip(starts, ends)]
@@ -3,23 +3,43 @@ import pygame
 from src import constants
 
 
+debug_font = None
+
+
+def get_debug_font():
+    """Create the font shared by all scenes on first use
+    because looking up system fonts is slow.
+    """
+    global debug_font
+    if debug_font is None:
+        import pygame.freetype
+        pygame.freetype.init()
+        debug_font = pygame.freetype.SysFont(
+            "consolas, inconsolate, monospace",
+            16
+        )
+        debug_font.pad = True
+        debug_font.fgcolor = [(255 - c) % 256 for c in constants.BACKGROUND_COLOR[:3]]
+    return debug_font
+
+
 class Scene:
     def __init__(self, scene_manager, debug):
         self.scene_manager = scene_manager
         self.target_surface = scene_manager.display
         self.debug_mode = debug
-
-        self.debug_font = pygame.freetype.SysFont(
-            "consolas, inconsolate, monospace",
-            16
-        )
-        self.debug_font.pad = True
-        self.debug_font.fgcolor = [(255 - c) % 256 for c in constants.BACKGROUND_COLOR[:3]]
-        self.debug_line_spacing = pygame.Vector2(
-            0, self.debug_font.get_sized_height()
-        )
+        # If set, the next draw repaints and updates the whole display.
+        self.redraw_all = True
         self.debug_margin = pygame.Vector2(5, 5)
 
+    @property
+    def debug_font(self):
+        return get_debug_font()
+
+    @property
+    def debug_line_spacing(self):
+        return pygame.Vector2(0, self.debug_font.get_sized_height())
+
     def process_event(self, event):
         if event.type == pygame.QUIT:
             self.close()
@@ -30,14 +50,43 @@ class Scene:
                 return True
             elif event.key == pygame.K_F1:
                 self.debug_mode = not self.debug_mode
+                self.redraw_all = True
+        elif event.type == pygame.WINDOWEXPOSED:
+            self.redraw_all = True
+
+    def process_circles_key(self, key, circles):
+        """Handle the keys that control the circles, shared by the scenes
+        which show them. circles is an Epicycles or EpicyclesGroup.
+        """
+        if key == pygame.K_SPACE:
+            self.paused = not self.paused
+        elif key == pygame.K_c:
+            circles.circles_visible = not circles.circles_visible
+        elif key == pygame.K_PLUS or key == pygame.K_KP_PLUS:
+            circles.rotate_faster()
+        elif key == pygame.K_MINUS or key == pygame.K_KP_MINUS:
+            circles.rotate_slower()
+        elif key == pygame.K_r:
+            circles.reverse_direction()
+        elif key == pygame.K_BACKSPACE:
+            circles.erase_line()
+        elif key == pygame.K_f:
+            circles.fade = not circles.fade
 
     def update(self, dt):
         pass
 
     def draw(self):
+        """Return a list of the changed areas of the display
+        or None if all of it changed.
+        """
+        return None
+
+    def set_detail_level(self, level):
         pass
 
     def start(self):
+        self.redraw_all = True
         self.debug_mode = self.scene_manager.persistent_scene_data.get(
             "debug_mode", self.debug_mode
         )
@@ -1,107 +1,228 @@
+import numpy
 import pygame
-import pygame.freetype
 
+import functools
 import math
 
 from src import constants
 from src import scene
 from src import epicycles
-from src import transform
+from src import harmonics_cache
+from src import shape_loader
+from src import shape_stream
 
 
 class Circles(scene.Scene):
-    def __init__(self, scene_manager, start_paused, debug):
+    def __init__(self, scene_manager, start_paused, debug,
+                 table_size=None,
+                 table_memory=constants.DEFAULT_PATH_TABLE_MEMORY,
+                 max_error=0, energy=0, incremental=False,
+                 single_precision=False):
         super().__init__(scene_manager, debug)
         self.paused = start_paused
+        self.table_size = table_size
+        self.table_memory = table_memory
+        self.max_error = max_error
+        self.energy = energy
+        self.incremental = incremental
+        self.dtype = numpy.complex64 if single_precision else numpy.complex128
         self.debug_mode = debug
         self.epicycles = None
+        self.stream = None
+        self.detail_level = 0
+        self.changed = False  # set if something changed while paused
+        self.drawn_rects = []
 
     def start(self, filename="", n=0, fade=False,
-              scale=constants.DEFAULT_SCALE_FACTOR, reverse=False):
+              scale=constants.DEFAULT_SCALE_FACTOR, reverse=False,
+              two_opt=False, resample_count=0, tolerance=0,
+              stream="", binary=False):
         super().start()
         target_surface_rect = self.target_surface.get_rect()
-        points = []
-        if filename:
-            with open(filename, "r") as file:
-                for line in file:
-                    x, y = line.split()
-                    # Flip the image by negating y because in pygame y=0
-                    # is at the top.
-                    points.append(pygame.Vector2(float(x), -float(y)))
-            points = transform.scale(
-                *transform.center(points),
+        startup = self.scene_manager.startup
+        if stream:
+            # The circles get replaced whenever a new shape arrives.
+            self.stream = shape_stream.ShapeStream(
+                stream,
+                binary,
+                functools.partial(self.make_epicycles, n=n, fade=fade,
+                                  reverse=reverse),
                 scale,
-                target_surface_rect
+                target_surface_rect,
+                resample_count,
+                tolerance
             )
+            return
+        if filename:
+            points = shape_loader.load(filename, scale, target_surface_rect,
+                                       two_opt, resample_count, tolerance)
+            harmonics = None
+            startup.mark("load shape")
         else:
+            # The draw scene passes the harmonics of its preview along.
             points = self.scene_manager.persistent_scene_data.get("points")
+            harmonics = self.scene_manager.persistent_scene_data.get("harmonics")
 
         if points is not None:
-            self.epicycles = epicycles.Epicycles(
-                points=points,
-                n=n,
-                fade=fade,
-                reverse=reverse,
-                surface_center=target_surface_rect.center,
-                debug=self.debug_mode
-            )
+            if harmonics is None:
+                harmonics = harmonics_cache.get(points)
+            startup.mark("transform")
+            self.epicycles = self.make_epicycles(points, harmonics, n, fade, reverse)
+            startup.mark("circles")
+
+    def make_epicycles(self, points, harmonics, n, fade, reverse):
+        return epicycles.Epicycles(
+            points=points,
+            n=n,
+            fade=fade,
+            reverse=reverse,
+            surface_center=self.target_surface.get_rect().center,
+            debug=self.debug_mode,
+            table_size=self.table_size,
+            table_memory=self.table_memory,
+            harmonics=harmonics,
+            max_error=self.max_error,
+            energy=self.energy,
+            incremental=self.incremental,
+            dtype=self.dtype,
+            profiler=self.scene_manager.profiler
+        )
+
+    def swap_epicycles(self, new_epicycles):
+        """Continue with other circles from the angle,
+        speed and settings of the current ones.
+        """
+        old_epicycles = self.epicycles
+        if old_epicycles is not None:
+            new_epicycles.angular_velocity = old_epicycles.angular_velocity
+            new_epicycles.velocity_positive = old_epicycles.velocity_positive
+            new_epicycles.trail.decreasing = old_epicycles.trail.decreasing
+            new_epicycles.circles_visible = old_epicycles.circles_visible
+            new_epicycles.fade = old_epicycles.fade
+            new_epicycles.set_angle(old_epicycles.current_angle)
+        new_epicycles.set_detail_level(self.detail_level)
+        self.epicycles = new_epicycles
+        self.redraw_all = True
 
     def process_event(self, event):
         done = super().process_event(event)
         if done:
             return
         if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                self.paused = not self.paused
-            elif event.key == pygame.K_c:
-                self.epicycles.circles_visible = not self.epicycles.circles_visible
-            elif event.key == pygame.K_PLUS or event.key == pygame.K_KP_PLUS:
-                self.epicycles.rotate_faster()
-            elif event.key == pygame.K_MINUS or event.key == pygame.K_KP_MINUS:
-                self.epicycles.rotate_slower()
-            elif event.key == pygame.K_r:
-                self.epicycles.reverse_direction()
-            elif event.key == pygame.K_BACKSPACE:
-                self.epicycles.erase_line()
-            elif event.key == pygame.K_f:
-                self.epicycles.fade = not self.epicycles.fade
-            elif event.key == pygame.K_RETURN:
+            self.changed = True
+            if event.key == pygame.K_RETURN:
                 self.close("draw")
+            elif self.epicycles is None:
+                return  # still waiting for the first streamed shape
+            else:
+                self.process_circles_key(event.key, self.epicycles)
+
+    def set_detail_level(self, level):
+        self.detail_level = level
+        if self.epicycles is not None:
+            self.epicycles.set_detail_level(level)
+            self.changed = True
 
     def update(self, dt):
-        if not self.paused:
+        if self.stream is not None:
+            new_epicycles = self.stream.poll()
+            if new_epicycles is not None:
+                self.swap_epicycles(new_epicycles)
+        if not self.paused and self.epicycles is not None:
             self.epicycles.update(dt)
 
     def draw(self):
-        self.target_surface.fill(constants.BACKGROUND_COLOR)
-        self.epicycles.draw(self.target_surface)
+        if self.paused and not self.changed and not self.redraw_all:
+            return []
+        self.changed = False
+        if self.epicycles is None:
+            if not self.redraw_all:
+                return []
+            self.target_surface.fill(constants.BACKGROUND_COLOR)
+            self.redraw_all = False
+            return None
+
+        # Repaint where something was drawn in the last frame and where
+        # something will be drawn in this one.
+        if self.redraw_all:
+            areas = None
+        else:
+            areas = [
+                rect for rect in self.drawn_rects + self.epicycles.get_bounding_rects()
+                if rect.width > 0 and rect.height > 0
+            ]
+        if not self.epicycles.draws_background:
+            if areas is None:
+                self.target_surface.fill(constants.BACKGROUND_COLOR)
+            else:
+                for area in areas:
+                    self.target_surface.fill(constants.BACKGROUND_COLOR, area)
+        self.epicycles.draw(self.target_surface, areas)
+        self.drawn_rects = self.epicycles.get_bounding_rects()
 
         if self.debug_mode:
-            fps = int(self.scene_manager.clock.get_fps())
-            self.debug_font.render_to(
-                self.target_surface,
-                self.debug_margin,
-                f"fps: {fps}"
-            )
-            self.debug_font.render_to(
-                self.target_surface,
-                self.debug_margin + self.debug_line_spacing,
-                f"angular velocity: {self.epicycles.angular_velocity} rad/s"
-            )
-            self.debug_font.render_to(
-                self.target_surface,
-                self.debug_margin + self.debug_line_spacing * 2,
-                f"angle: {self.epicycles.current_angle:.2f} rad " +
-                f"({self.epicycles.current_angle % math.tau:.2f})"
-            )
+            with self.scene_manager.profiler.measure("draw: overlay"):
+                self.drawn_rects.extend(self.draw_debug_info())
+                self.drawn_rects.append(self.draw_frame_graph())
+
+        if self.redraw_all:
+            self.redraw_all = False
+            return None
+        return areas + self.drawn_rects
+
+    def draw_debug_info(self):
+        """Render the debug text and return the rects it covers."""
+        fps = int(self.scene_manager.clock.get_fps())
+        lines = [
+            f"fps: {fps}",
+            f"angular velocity: {self.epicycles.angular_velocity} rad/s",
+            f"angle: {self.epicycles.current_angle:.2f} rad " +
+            f"({self.epicycles.current_angle % math.tau:.2f})",
+            f"oldest angle: {self.epicycles.trail.angles[0]:.2f} rad " +
+            f"({self.epicycles.trail.angles[0] % math.tau:.2f})",
+            f"number of points: {len(self.epicycles.trail)}",
+            f"detail level: {self.epicycles.detail_level}",
+            "stage: mean, p95, p99 in ms"
+        ]
+        profiler = self.scene_manager.profiler
+        for stage in sorted(profiler.samples):
+            mean, p95, p99 = profiler.statistics(stage)
+            lines.append(f"{stage}: {mean:.2f}, {p95:.2f}, {p99:.2f}")
+        return [
             self.debug_font.render_to(
                 self.target_surface,
-                self.debug_margin + self.debug_line_spacing * 3,
-                f"oldest angle: {self.epicycles.angles[0]:.2f} rad " +
-                f"({self.epicycles.angles[0] % math.tau:.2f})"
+                self.debug_margin + self.debug_line_spacing * i,
+                line
             )
-            self.debug_font.render_to(
+            for i, line in enumerate(lines)
+        ]
+
+    def draw_frame_graph(self):
+        """Draw the recent frame times as a bar graph in the bottom left
+        corner and return its rect. The line marks the frame time at FPS.
+        """
+        samples = self.scene_manager.profiler.samples.get("frame", ())
+        height = constants.PROFILER_GRAPH_HEIGHT
+        rect = pygame.Rect(0, 0, constants.PROFILER_WINDOW, height)
+        rect.bottomleft = (
+            self.debug_margin.x,
+            self.target_surface.get_height() - self.debug_margin.y
+        )
+        pixels_per_second = height / 2 * constants.FPS
+        for x, frame_time in enumerate(samples, rect.left):
+            bar_height = min(height, round(frame_time * pixels_per_second))
+            if bar_height == 0:
+                continue
+            pygame.draw.line(
                 self.target_surface,
-                self.debug_margin + self.debug_line_spacing * 4,
-                f"number of points: {len(self.epicycles.points)}"
+                constants.CIRCLE_COLOR,
+                (x, rect.bottom - 1),
+                (x, rect.bottom - bar_height)
             )
+        pygame.draw.line(
+            self.target_surface,
+            self.debug_font.fgcolor,
+            (rect.left, rect.bottom - height // 2),
+            (rect.right - 1, rect.bottom - height // 2)
+        )
+        return rect
@@ -1,14 +1,34 @@
+import numpy
 import pygame
 
 from src import scene
 from src import constants
+from src import epicycles
 from src import transform
 
 
 class Draw(scene.Scene):
     def __init__(self, scene_manager, debug):
         super().__init__(scene_manager, debug)
-        self.points = []
+        # The mouse positions in order plus a set of them
+        # for checking quickly if a position is new.
+        self.points = numpy.empty((constants.DRAW_CAPACITY, 2), dtype=numpy.float64)
+        self.point_count = 0
+        self.point_set = set()
+        # The stroke is drawn segment by segment on its own surface.
+        self.stroke_layer = pygame.Surface(self.target_surface.get_size())
+        self.stroke_layer.fill(constants.BACKGROUND_COLOR)
+        self.drawn_count = 0  # number of points already on the stroke layer
+        self.drawn_rects = []
+
+        # Circles tracing the stroke while it is drawn. The harmonics are
+        # reused for the circles scene if the stroke didn't change since.
+        self.preview = None
+        self.preview_count = 0  # number of points the preview was made of
+        self.preview_age = 0  # seconds since the last update of the preview
+        self.preview_points = None
+        self.preview_harmonics = None
+        self.detail_level = 0
 
     def process_event(self, event):
         done = super().process_event(event)
@@ -18,35 +38,139 @@ class Draw(scene.Scene):
             if event.key == pygame.K_RETURN:
                 self.close("circles")
             elif event.key == pygame.K_BACKSPACE:
-                self.points = []
+                self.point_count = 0
+                self.point_set.clear()
+                self.stroke_layer.fill(constants.BACKGROUND_COLOR)
+                self.drawn_count = 0
+                self.preview = None
+                self.preview_count = 0
+                self.redraw_all = True
 
     def update(self, dt):
-        if pygame.mouse.get_pressed()[0]:
+        mouse_pressed = pygame.mouse.get_pressed()[0]
+        if mouse_pressed:
             mouse_pos = pygame.mouse.get_pos()
-            if mouse_pos not in self.points:
-                self.points.append(mouse_pos)
+            if mouse_pos not in self.point_set:
+                self.point_set.add(mouse_pos)
+                self.add_point(mouse_pos)
+
+        self.preview_age += dt
+        if (self.point_count > 2 and self.point_count != self.preview_count
+                and (not mouse_pressed
+                     or self.preview_age >= constants.DRAW_PREVIEW_INTERVAL)):
+            self.update_preview()
+        if self.preview is not None:
+            self.preview.update(dt)
+
+    def add_point(self, point):
+        if self.point_count == len(self.points):
+            self.points = numpy.concatenate((self.points, numpy.empty_like(self.points)))
+        self.points[self.point_count] = point
+        self.point_count += 1
+
+    def get_shape(self):
+        """Return the stroke centered around (0, 0) and resampled for the
+        transform and the position of its center on the display.
+        """
+        points = self.points[:self.point_count].copy()
+        max_xy = points.max(axis=0)
+        min_xy = points.min(axis=0)
+        points = transform.center(points)[0]
+        # The mouse positions are unevenly spaced.
+        points = transform.resample(
+            points,
+            tolerance=constants.DRAW_RESAMPLE_TOLERANCE
+        )
+        return points, (max_xy + min_xy) / 2
+
+    def update_preview(self):
+        """Replace the preview with circles for all points drawn so far.
+
+        The harmonics of a closed path depend on the number of points, so
+        they can't be updated point by point. Instead this runs at most
+        every DRAW_PREVIEW_INTERVAL seconds while drawing and once the
+        mouse button is released.
+        """
+        points, center = self.get_shape()
+        harmonics = transform.transform(points)
+        angle = 0 if self.preview is None else self.preview.current_angle
+        self.preview = epicycles.Epicycles(
+            points=points,
+            n=0,
+            fade=False,
+            reverse=False,
+            surface_center=center,
+            debug=False,
+            harmonics=harmonics,
+            profiler=self.scene_manager.profiler
+        )
+        self.preview.set_detail_level(self.detail_level)
+        self.preview.set_angle(angle)
+        self.preview_count = self.point_count
+        self.preview_age = 0
+        self.preview_points = points
+        self.preview_harmonics = harmonics
+
+    def set_detail_level(self, level):
+        self.detail_level = level
+        if self.preview is not None:
+            self.preview.set_detail_level(level)
 
     def draw(self):
-        self.target_surface.fill(constants.BACKGROUND_COLOR)
-        if len(self.points) > 1:
+        # Repaint where something was drawn in the last frame and where
+        # something will be drawn in this one, like the circles scene.
+        if self.redraw_all:
+            areas = None
+        else:
+            areas = list(self.drawn_rects)
+            if self.preview is not None:
+                areas.extend(self.preview.get_bounding_rects())
+
+        new_points = self.points[max(0, self.drawn_count - 1):self.point_count]
+        if len(new_points) > 1:
             pygame.draw.aalines(
-                self.target_surface,
+                self.stroke_layer,
                 constants.DRAW_COLOR,
                 False,
-                self.points
+                new_points
             )
+            if areas is not None:
+                areas.append(transform.bounding_rect(new_points, 0))
+        self.drawn_count = self.point_count
+
+        if areas is None:
+            self.target_surface.blit(self.stroke_layer, (0, 0))
+        else:
+            areas = [rect for rect in areas if rect.width > 0 and rect.height > 0]
+            for area in areas:
+                self.target_surface.blit(self.stroke_layer, area, area)
+
+        self.drawn_rects = []
+        if self.preview is not None:
+            self.preview.draw(self.target_surface)
+            self.drawn_rects = self.preview.get_bounding_rects()
 
         if self.debug_mode:
             fps = int(self.scene_manager.clock.get_fps())
-            self.debug_font.render_to(
+            self.drawn_rects.append(self.debug_font.render_to(
                 self.target_surface,
                 self.debug_margin,
                 f"fps: {fps}"
-            )
+            ))
+
+        if self.redraw_all:
+            self.redraw_all = False
+            return None
+        return areas + self.drawn_rects
 
     def close(self, next_scene_name=""):
-        if len(self.points) > 1:
-            points = [pygame.Vector2(p) for p in self.points]
-            points = transform.center(points)[0]
+        if self.point_count > 1:
+            if self.preview_count == self.point_count:
+                points = self.preview_points
+                harmonics = self.preview_harmonics
+            else:
+                points = self.get_shape()[0]
+                harmonics = None
             self.scene_manager.persistent_scene_data["points"] = points
+            self.scene_manager.persistent_scene_data["harmonics"] = harmonics
         super().close(next_scene_name)
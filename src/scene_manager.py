@@ -1,31 +1,82 @@
+import functools
+import time
+
 import pygame
-import pygame.freetype
 
 from src import constants
+from src import governor
+from src import profiling
 from src import scene_circles
 from src import scene_draw
+from src import scene_wall
+from src import shape_loader
 
 
 class SceneManager:
     def __init__(self, file, n, scale, fade,
-                 reverse, start_paused, window_size, debug):
-        pygame.init()
+                 reverse, start_paused, window_size, debug,
+                 table_size=None,
+                 table_memory=constants.DEFAULT_PATH_TABLE_MEMORY,
+                 two_opt=False, resample_count=0, tolerance=0,
+                 max_error=0, energy=0, fixed_detail=False,
+                 incremental=False, profile_csv="", cprofile="",
+                 single_precision=False, stream="", binary=False,
+                 start_time=None):
+        self.debug = debug
+        self.startup = profiling.StartupTimer(start_time)
+        self.startup.mark("imports")
+        # Only the display is needed, the font gets initialized
+        # when it is first used.
+        pygame.display.init()
         pygame.display.set_caption("Epicycles")
         self.display = pygame.display.set_mode(window_size)
+        self.startup.mark("display")
         self.running = True
         self.clock = pygame.time.Clock()
+        self.governor = None if fixed_detail else governor.Governor()
+        # The profiler runs in debug mode or if its results get saved.
+        self.profiler = profiling.Profiler()
+        if profile_csv:
+            self.profiler.add_hook(profiling.CsvHook(profile_csv))
+        if cprofile:
+            self.profiler.add_hook(profiling.CProfileHook(cprofile))
 
-        self.scenes = {
-            "circles": scene_circles.Circles(self, start_paused, debug),
-            "draw": scene_draw.Draw(self, debug)
+        # The scenes are created when they are first shown.
+        self.scene_factories = {
+            "circles": functools.partial(scene_circles.Circles, self,
+                                         start_paused, debug,
+                                         table_size, table_memory,
+                                         max_error, energy, incremental,
+                                         single_precision),
+            "draw": functools.partial(scene_draw.Draw, self, debug),
+            "wall": functools.partial(scene_wall.Wall, self, start_paused,
+                                      debug, max_error, energy)
         }
+        self.scenes = {}
         self.persistent_scene_data = {}
-        if file:
-            self.active_scene = self.scenes["circles"]
+        if stream:
+            self.active_scene = self.get_scene("circles")
+            self.active_scene.start(n=n, scale=scale, fade=fade,
+                                    reverse=reverse,
+                                    resample_count=resample_count,
+                                    tolerance=tolerance,
+                                    stream=stream, binary=binary)
+        elif file and shape_loader.is_pattern(file):
+            self.active_scene = self.get_scene("wall")
+            self.active_scene.start(pattern=file, n=n, scale=scale,
+                                    fade=fade, reverse=reverse,
+                                    two_opt=two_opt,
+                                    resample_count=resample_count,
+                                    tolerance=tolerance)
+        elif file:
+            self.active_scene = self.get_scene("circles")
             self.active_scene.start(filename=file, n=n, scale=scale,
-                                    fade=fade, reverse=reverse)
+                                    fade=fade, reverse=reverse,
+                                    two_opt=two_opt,
+                                    resample_count=resample_count,
+                                    tolerance=tolerance)
         else:
-            self.active_scene = self.scenes["draw"]
+            self.active_scene = self.get_scene("draw")
 
     def run(self):
         # Prevent the first dt from getting too large due to file loading etc.
@@ -35,15 +86,43 @@ class SceneManager:
             # Protect against hiccups (e.g. from moving the pygame window)
             # by setting an upper limit to dt.
             dt = min(self.clock.tick(constants.FPS) / 1000, constants.DT_LIMIT)
-            for event in pygame.event.get():
-                self.active_scene.process_event(event)
-            self.active_scene.update(dt)
-            self.active_scene.draw()
-            pygame.display.flip()
+            profiler = self.profiler
+            profiler.enabled = self.active_scene.debug_mode or bool(profiler.hooks)
+            profiler.start_frame()
+            with profiler.measure("events"):
+                for event in pygame.event.get():
+                    self.active_scene.process_event(event)
+            frame_start = time.perf_counter()
+            with profiler.measure("update"):
+                self.active_scene.update(dt)
+            with profiler.measure("draw"):
+                dirty_rects = self.active_scene.draw()
+            if (self.governor is not None
+                    and self.governor.add_frame_time(time.perf_counter() - frame_start)):
+                self.active_scene.set_detail_level(self.governor.level)
+            with profiler.measure("display"):
+                if dirty_rects is None:
+                    pygame.display.flip()
+                else:
+                    pygame.display.update(dirty_rects)
+            profiler.end_frame()
+            if not self.startup.finished:
+                self.startup.finish()
+                if self.debug:
+                    print(self.startup.report())
+        self.profiler.close()
+
+    def get_scene(self, name):
+        scene = self.scenes.get(name)
+        if scene is None:
+            scene = self.scenes[name] = self.scene_factories[name]()
+        return scene
 
     def change_scenes(self, next_scene_name=""):
         if not next_scene_name:
             self.running = False
             return
-        self.active_scene = self.scenes[next_scene_name]
+        self.active_scene = self.get_scene(next_scene_name)
         self.active_scene.start()
+        if self.governor is not None:
+            self.active_scene.set_detail_level(self.governor.level)
@@ -0,0 +1,101 @@
+import math
+
+import pygame
+
+from src import constants
+from src import scene
+from src import epicycles_group
+from src import harmonics_cache
+from src import shape_loader
+
+
+class Wall(scene.Scene):
+    """Many shapes at once, laid out in a grid."""
+
+    def __init__(self, scene_manager, start_paused, debug,
+                 max_error=0, energy=0):
+        super().__init__(scene_manager, debug)
+        self.paused = start_paused
+        self.max_error = max_error
+        self.energy = energy
+        self.group = None
+
+    def start(self, pattern="", n=0, fade=False,
+              scale=constants.DEFAULT_SCALE_FACTOR, reverse=False,
+              two_opt=False, resample_count=0, tolerance=0):
+        super().start()
+        if not pattern:
+            return
+        files = shape_loader.find_files(pattern)
+        if not files:
+            raise ValueError(f"No shape files found in \"{pattern}\".")
+
+        # Choose the number of columns so that the cells are about square.
+        width, height = self.target_surface.get_size()
+        columns = max(1, round(math.sqrt(len(files) * width / height)))
+        rows = math.ceil(len(files) / columns)
+        cell_width = width / columns
+        cell_height = height / rows
+        cell_rect = pygame.Rect(0, 0, cell_width, cell_height)
+
+        harmonics_list = []
+        centers = []
+        for i, filename in enumerate(files):
+            points = shape_loader.load(filename, scale, cell_rect, two_opt,
+                                       resample_count, tolerance)
+            harmonics_list.append(harmonics_cache.get(points))
+            centers.append(pygame.Vector2(
+                (i % columns + 0.5) * cell_width,
+                (i // columns + 0.5) * cell_height
+            ))
+        self.scene_manager.startup.mark("transform")
+        self.group = epicycles_group.EpicyclesGroup(
+            harmonics_list,
+            centers,
+            n,
+            fade,
+            reverse,
+            max_error=self.max_error,
+            energy=self.energy,
+            profiler=self.scene_manager.profiler
+        )
+        self.scene_manager.startup.mark("circles")
+
+    def process_event(self, event):
+        done = super().process_event(event)
+        if done:
+            return
+        if event.type == pygame.KEYDOWN and self.group is not None:
+            self.process_circles_key(event.key, self.group)
+
+    def set_detail_level(self, level):
+        if self.group is not None:
+            self.group.set_detail_level(level)
+
+    def update(self, dt):
+        if not self.paused:
+            self.group.update(dt)
+
+    def draw(self):
+        self.target_surface.fill(constants.BACKGROUND_COLOR)
+        self.group.draw(self.target_surface)
+        if self.debug_mode:
+            with self.scene_manager.profiler.measure("draw: overlay"):
+                self.draw_debug_info()
+        return None
+
+    def draw_debug_info(self):
+        fps = int(self.scene_manager.clock.get_fps())
+        lines = [
+            f"fps: {fps}",
+            f"number of shapes: {self.group.shape_count}",
+            f"number of circles: {len(self.group.amplitudes)}",
+            f"points per line: {len(self.group.trail)}",
+            f"detail level: {self.group.detail_level}"
+        ]
+        for i, line in enumerate(lines):
+            self.debug_font.render_to(
+                self.target_surface,
+                self.debug_margin + self.debug_line_spacing * i,
+                line
+            )
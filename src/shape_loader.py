@@ -0,0 +1,118 @@
+import glob
+import hashlib
+import os
+import warnings
+
+import numpy
+
+from src import constants
+from src import harmonics_cache
+from src import transform
+
+
+IMAGE_EXTENSIONS = (".png", ".bmp", ".gif", ".tga", ".jpg", ".jpeg")
+TEXT_EXTENSIONS = (".txt",)
+
+
+def load(filename, scale_factor, target_surface_rect, two_opt=False,
+         resample_count=0, tolerance=0):
+    """Read the points of a shape from a text file with one "x y" pair
+    per line or trace the path in an image file (see image_loader.load).
+    The shape gets centered and scaled to the target surface. If
+    resample_count or tolerance is set, it gets resampled
+    (see transform.resample).
+    """
+    points = read_points(filename, two_opt)
+    return prepare(
+        points,
+        not filename.lower().endswith(IMAGE_EXTENSIONS),
+        scale_factor,
+        target_surface_rect,
+        resample_count,
+        tolerance
+    )
+
+
+def prepare(points, flip, scale_factor, target_surface_rect,
+            resample_count=0, tolerance=0):
+    """Center, scale and resample the (n, 2) array of points like load.
+    If flip is set, the y axis points up like in the text files.
+    """
+    if flip:
+        # Flip the shape by negating y because in pygame y=0 is at the top.
+        points[:, 1] *= -1
+    points = transform.scale(
+        *transform.center(points),
+        scale_factor,
+        target_surface_rect
+    )
+    if resample_count != 0 or tolerance > 0:
+        points = transform.resample(points, resample_count, tolerance)
+    return points
+
+
+def read_points(filename, two_opt=False):
+    """Return the points in the file as an (n, 2) array.
+
+    Parsed files are stored in the cache directory together with their
+    modification time and size, so later runs can skip the parsing.
+    """
+    stat = os.stat(filename)
+    key = numpy.array([stat.st_mtime_ns, stat.st_size, two_opt], dtype=numpy.int64)
+    path_hash = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+    cache_file = os.path.join(constants.CACHE_DIRECTORY, f"points_{path_hash}.npz")
+    try:
+        with numpy.load(cache_file) as cached:
+            if numpy.array_equal(cached["key"], key):
+                points = cached["points"]
+                os.utime(cache_file)
+                return points
+    except harmonics_cache.LOAD_ERRORS:
+        pass
+
+    if filename.lower().endswith(IMAGE_EXTENSIONS):
+        # Only needed for images, so it is imported here to start faster.
+        from src import image_loader
+        points = image_loader.load(filename, two_opt)
+    else:
+        points = read_text_points(filename)
+    try:
+        harmonics_cache.save(cache_file, key=key, points=points)
+        harmonics_cache.prune_directory("points_*.npz", constants.POINTS_CACHE_FILES)
+    except OSError:
+        pass  # The cache is optional.
+    return points
+
+
+def read_text_points(filename):
+    """Parse a text file with one "x y" pair per line. Empty lines
+    are skipped.
+    """
+    message = f"\"{filename}\" must contain one \"x y\" pair per line."
+    try:
+        with warnings.catch_warnings():
+            # An empty file is reported below instead.
+            warnings.simplefilter("ignore", UserWarning)
+            points = numpy.loadtxt(filename, dtype=numpy.float64, ndmin=2)
+    except ValueError:
+        raise ValueError(message) from None
+    if points.shape[1] != 2:
+        raise ValueError(message)
+    if len(points) < 2:
+        raise ValueError(f"\"{filename}\" must contain at least two points.")
+    return points
+
+
+def is_pattern(path):
+    """True if the path is a directory or a glob pattern for many shapes."""
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def find_files(pattern):
+    """Return the shape files in a directory or matching a glob pattern."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*")
+    return sorted(
+        filename for filename in glob.glob(pattern)
+        if filename.lower().endswith(TEXT_EXTENSIONS + IMAGE_EXTENSIONS)
+    )
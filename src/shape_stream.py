@@ -0,0 +1,148 @@
+import os
+import queue
+import stat
+import struct
+import sys
+import threading
+
+import numpy
+
+from src import shape_loader
+from src import transform
+
+
+# A binary shape is its number of points as a little-endian uint32
+# followed by that many x, y pairs of little-endian float32.
+BINARY_HEADER = struct.Struct("<I")
+BINARY_POINT = numpy.dtype("<f4")
+
+
+class ShapeStream:
+    """Read shapes from stdin or a named pipe in a background thread.
+
+    In the text format every shape has one "x y" pair per line like the
+    shape files and ends with an empty line or the end of the input. For
+    the binary format see BINARY_HEADER. Every complete shape gets
+    prepared like a shape file, transformed and passed to make_epicycles
+    in the thread, so the render loop only has to pick up the result with
+    poll. A named pipe is opened again when the writer closes it.
+    """
+
+    def __init__(self, source, binary, make_epicycles, scale_factor,
+                 target_surface_rect, resample_count=0, tolerance=0):
+        self.source = source
+        self.binary = binary
+        self.make_epicycles = make_epicycles
+        self.scale_factor = scale_factor
+        self.target_surface_rect = target_surface_rect
+        self.resample_count = resample_count
+        self.tolerance = tolerance
+        self.results = queue.Queue()
+        # A daemon thread doesn't keep the app alive while waiting for input.
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def poll(self):
+        """Return the Epicycles instance of the newest complete
+        shape since the last call or None.
+        """
+        result = None
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return result
+
+    def run(self):
+        while True:
+            if self.source == "-":
+                file = sys.stdin.buffer if self.binary else sys.stdin
+                self.read_shapes(file)
+                return
+            with open(self.source, "rb" if self.binary else "r") as file:
+                self.read_shapes(file)
+            if not stat.S_ISFIFO(os.stat(self.source).st_mode):
+                return
+
+    def read_shapes(self, file):
+        read_shape = read_binary_shape if self.binary else read_text_shape
+        while True:
+            points = read_shape(file)
+            if points is None:
+                return
+            # A bad shape must not end the thread, the next one may be fine.
+            try:
+                self.results.put(self.make_shape(points))
+            except Exception as error:
+                print(f"Skipping shape: {error}", file=sys.stderr)
+
+    def make_shape(self, points):
+        """Prepare and transform the points and return the result of
+        make_epicycles. Raises ValueError if they don't form a shape.
+        """
+        if len(points) < 2:
+            raise ValueError("It has less than two points.")
+        if not numpy.isfinite(points).all():
+            raise ValueError("It contains coordinates that are not finite.")
+        if not numpy.ptp(points, axis=0).any():
+            raise ValueError("All of its points are the same.")
+        points = shape_loader.prepare(
+            points,
+            True,
+            self.scale_factor,
+            self.target_surface_rect,
+            self.resample_count,
+            self.tolerance
+        )
+        harmonics = transform.transform(points)
+        if len(harmonics[0]) == 0:
+            raise ValueError("It has no circles.")
+        return self.make_epicycles(points, harmonics)
+
+
+def read_text_shape(file):
+    """Return the points up to the next empty line as an (n, 2) array
+    or None at the end of the input. Malformed lines are skipped.
+    """
+    values = []
+    for line in file:
+        pair = line.split()
+        if not pair:
+            if values:
+                break
+            continue
+        try:
+            x, y = map(float, pair)
+        except ValueError:
+            print(f"Skipping malformed line: {line.strip()}", file=sys.stderr)
+            continue
+        values.append((x, y))
+    else:
+        if not values:
+            return None
+    return numpy.array(values, dtype=numpy.float64)
+
+
+def read_binary_shape(file):
+    """Return the points of the next shape as an (n, 2)
+    array or None at the end of the input.
+    """
+    header = read_exactly(file, BINARY_HEADER.size)
+    if header is None:
+        return None
+    count, = BINARY_HEADER.unpack(header)
+    data = read_exactly(file, count * 2 * BINARY_POINT.itemsize)
+    if data is None:
+        return None
+    return numpy.frombuffer(data, dtype=BINARY_POINT).reshape(-1, 2).astype(numpy.float64)
+
+
+def read_exactly(file, size):
+    """Read size bytes or return None if the input ends before."""
+    data = bytearray()
+    while len(data) < size:
+        chunk = file.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
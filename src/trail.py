@@ -0,0 +1,134 @@
+import numpy
+
+from src import constants
+
+
+class Trail:
+    """Ring buffer for the points and angles of the line.
+
+    Every element is written twice, at index i and i + capacity, so that
+    the live window is always one contiguous slice and can be handed to the
+    draw functions without copying. Dropping old elements only moves the
+    start index. The buffers only get reallocated if the line grows
+    beyond the capacity.
+
+    If width is set, the trail holds that many lines which share the
+    same angles. Every point is then an array of width complex numbers
+    and each line is a contiguous row of the buffer.
+
+    The points are stored with the complex dtype, the angles always
+    as float64 because they keep growing.
+    """
+
+    def __init__(self, capacity=constants.TRAIL_CAPACITY, width=None,
+                 dtype=numpy.complex128):
+        self.capacity = capacity
+        self.width = width
+        self.dtype = numpy.dtype(dtype)
+        # The dtype of the x and y coordinates.
+        self.float_dtype = numpy.empty(0, dtype=self.dtype).real.dtype
+        shape = 2 * capacity if width is None else (width, 2 * capacity)
+        self._points = numpy.empty(shape, dtype=self.dtype)
+        self._angles = numpy.empty(2 * capacity, dtype=numpy.float64)
+        self.start = 0
+        self.length = 0
+        # The angles are increasing unless this is set.
+        self.decreasing = False
+        # Running counts, so that the points can be identified across
+        # trimming and the erasing of the line can be detected.
+        self.appended = 0
+        self.erased = 0
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def first_index(self):
+        """The running number of the oldest point."""
+        return self.appended - self.length
+
+    @property
+    def complex_points(self):
+        return self._points[..., self.start:self.start + self.length]
+
+    @property
+    def points(self):
+        """The points as an (n, 2) array of x and y coordinates."""
+        return self.complex_points.view(self.float_dtype).reshape(-1, 2)
+
+    def line_points(self, row):
+        """The points of one of the lines if width is set, like points."""
+        points = self._points[row, self.start:self.start + self.length]
+        return points.view(self.float_dtype).reshape(-1, 2)
+
+    @property
+    def angles(self):
+        return self._angles[self.start:self.start + self.length]
+
+    def append(self, point, angle):
+        if self.length == self.capacity:
+            self.grow(self.length + 1)
+        i = (self.start + self.length) % self.capacity
+        self._points[..., i] = self._points[..., i + self.capacity] = point
+        self._angles[i] = self._angles[i + self.capacity] = angle
+        self.length += 1
+        self.appended += 1
+
+    def extend(self, points, angles):
+        count = len(angles)
+        if self.length + count > self.capacity:
+            self.grow(self.length + count)
+        end = self.start + self.length
+        indices = numpy.arange(end, end + count) % self.capacity
+        self._points[..., indices] = points
+        self._points[..., indices + self.capacity] = points
+        self._angles[indices] = angles
+        self._angles[indices + self.capacity] = angles
+        self.length += count
+        self.appended += count
+
+    def grow(self, minimum_capacity):
+        points = self.complex_points.copy()
+        angles = self.angles.copy()
+        decreasing = self.decreasing
+        appended = self.appended
+        erased = self.erased
+        capacity = self.capacity
+        while capacity < minimum_capacity:
+            capacity *= 2
+        self.__init__(capacity, self.width, self.dtype)
+        self.decreasing = decreasing
+        self.extend(points, angles)
+        self.appended = appended
+        self.erased = erased
+
+    def trim(self, limit):
+        """Remove the oldest elements up to the first angle beyond limit.
+
+        The angles are monotonic so the cut is found by binary search.
+        Nothing is removed if no angle is beyond the limit.
+        """
+        angles = self.angles
+        low = 0
+        high = self.length
+        while low < high:
+            middle = (low + high) // 2
+            if (angles[middle] >= limit if self.decreasing
+                    else angles[middle] <= limit):
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.length:
+            self.start = (self.start + low) % self.capacity
+            self.length -= low
+
+    def erase(self):
+        """Keep only the newest point. It is stored twice so that
+        the line draw functions don't complain.
+        """
+        point = self.complex_points[..., -1].copy()
+        angle = self.angles[-1]
+        self.start = (self.start + self.length - 1) % self.capacity
+        self.length = 1
+        self.erased += 1
+        self.append(point, angle)
@@ -0,0 +1,119 @@
+import numpy
+import pygame
+
+from src import constants
+
+
+class TrailLayer:
+    """Keep the line on a persistent surface and only draw what changed.
+
+    New segments are drawn on top of the surface. The surface is divided
+    into square tiles which remember the oldest segment drawn on them.
+    Once that segment has been trimmed from the line, the tile is cleared
+    and the segments still crossing it are redrawn, clipped to the tile.
+    Segments are identified by the running number of their first point
+    (see Trail.first_index).
+    """
+
+    def __init__(self, size):
+        self.surface = pygame.Surface(size)
+        self.tiles_x = -(-size[0] // constants.TRAIL_TILE_SIZE)
+        self.tiles_y = -(-size[1] // constants.TRAIL_TILE_SIZE)
+        self.oldest_segment = numpy.empty(
+            (self.tiles_x, self.tiles_y),
+            dtype=numpy.float64
+        )
+        self.drawn_end = None  # running number of the last drawn point
+        self.erased = None
+
+    def update(self, trail):
+        if self.drawn_end is None or self.erased != trail.erased:
+            self.rebuild(trail)
+            return
+        first = trail.first_index
+        end = trail.appended - 1
+        if end > self.drawn_end:
+            self.draw_new_segments(trail, self.drawn_end, end)
+        self.redraw_expired_tiles(trail, first)
+
+    def rebuild(self, trail):
+        self.surface.fill(constants.BACKGROUND_COLOR)
+        self.oldest_segment.fill(numpy.inf)
+        self.drawn_end = trail.first_index
+        self.erased = trail.erased
+        self.draw_new_segments(trail, self.drawn_end, trail.appended - 1)
+
+    def draw_new_segments(self, trail, start, end):
+        """Draw the segments between the points with
+        the running numbers start and end.
+        """
+        offset = trail.first_index
+        points = trail.points[start - offset:end - offset + 1]
+        if len(points) < 2:
+            return
+        pygame.draw.aalines(
+            self.surface,
+            constants.LINE_COLOR,
+            False,
+            points
+        )
+        low_x, low_y, high_x, high_y = self.segment_tiles(points)
+        for i, segment in enumerate(range(start, end)):
+            tiles = self.oldest_segment[
+                low_x[i]:high_x[i] + 1,
+                low_y[i]:high_y[i] + 1
+            ]
+            numpy.minimum(tiles, segment, out=tiles)
+        self.drawn_end = end
+
+    def redraw_expired_tiles(self, trail, first):
+        expired = numpy.argwhere(self.oldest_segment < first)
+        if len(expired) == 0:
+            return
+        points = trail.points
+        low_x, low_y, high_x, high_y = self.segment_tiles(points)
+        tile_size = constants.TRAIL_TILE_SIZE
+        for tile_x, tile_y in expired.tolist():
+            rect = pygame.Rect(
+                tile_x * tile_size,
+                tile_y * tile_size,
+                tile_size,
+                tile_size
+            )
+            self.surface.fill(constants.BACKGROUND_COLOR, rect)
+            crossing = (
+                (low_x <= tile_x) & (high_x >= tile_x)
+                & (low_y <= tile_y) & (high_y >= tile_y)
+            )
+            segments = numpy.flatnonzero(crossing)
+            if len(segments) == 0:
+                self.oldest_segment[tile_x, tile_y] = numpy.inf
+                continue
+            self.oldest_segment[tile_x, tile_y] = first + segments[0]
+            # Draw consecutive segments with one call.
+            breaks = numpy.flatnonzero(numpy.diff(segments) > 1)
+            starts = [segments[0]] + segments[breaks + 1].tolist()
+            ends = segments[breaks].tolist() + [segments[-1]]
+            self.surface.set_clip(rect)
+            for start, end in zip(starts, ends):
+                pygame.draw.aalines(
+                    self.surface,
+                    constants.LINE_COLOR,
+                    False,
+                    points[start:end + 2]
+                )
+            self.surface.set_clip(None)
+
+    def segment_tiles(self, points):
+        """Return the ranges of tiles touched by the segments between the
+        points as four arrays: lowest x, lowest y, highest x, highest y.
+        """
+        tile_size = constants.TRAIL_TILE_SIZE
+        # Anti-aliasing reaches one pixel beyond the line.
+        low = numpy.minimum(points[:-1], points[1:]) - 1
+        high = numpy.maximum(points[:-1], points[1:]) + 1
+        low = (low // tile_size).astype(numpy.int64)
+        high = (high // tile_size).astype(numpy.int64)
+        numpy.clip(low, 0, (self.tiles_x, self.tiles_y), out=low)
+        numpy.clip(high, -1, (self.tiles_x - 1, self.tiles_y - 1), out=high)
+        return low[:, 0], low[:, 1], high[:, 0], high[:, 1]
@@ -1,31 +1,34 @@
+import math
+
+import numpy
 import numpy.fft
 
 import pygame
 
 from src import constants
-from src import image_loader
 
 
 def complex_to_vec2(c):
     return pygame.Vector2(c.real, c.imag)
 
 
-def center(points):
-    """Center the shape around (0, 0)"""
-    max_x = max(points, key=lambda vec: vec.x).x
-    min_x = min(points, key=lambda vec: vec.x).x
-    max_y = max(points, key=lambda vec: vec.y).y
-    min_y = min(points, key=lambda vec: vec.y).y
-    shape_center = pygame.Vector2(
-        (max_x + min_x) / 2,
-        (max_y + min_y) / 2
-    )
-    for p in points:
-        p -= shape_center
-
-    width = max_x - min_x
-    height = max_y - min_y
+def bounding_rect(points, margin):
+    """Return the pygame.Rect around the (n, 2) array of points with
+    margin extra pixels and one more on each side for anti-aliasing.
+    """
+    low = numpy.floor(points.min(axis=0)) - margin - 1
+    high = numpy.ceil(points.max(axis=0)) + margin + 2
+    return pygame.Rect(low.tolist(), (high - low).tolist())
+
 
+def center(points):
+    """Center the shape around (0, 0). The points are an (n, 2) array
+    and get modified in place.
+    """
+    max_xy = points.max(axis=0)
+    min_xy = points.min(axis=0)
+    points -= (max_xy + min_xy) / 2
+    width, height = max_xy - min_xy
     return points, width, height
 
 
@@ -41,48 +44,106 @@ def scale(points, shape_width, shape_height, scale_factor, target_surface_rect):
             ratio = max_allowed_width / shape_width
         else:
             ratio = max_allowed_height / shape_height
-        for p in points:
-            p *= ratio
+        points *= ratio
 
     return points
 
 
+def resample(points, count=0, tolerance=0):
+    """Resample the closed path evenly by arc length.
+
+    The result has count points. If count is 0 it is chosen so that the
+    resampled path deviates at most tolerance from the original one, rounded
+    up to a power of two because that is the fastest size for the FFT.
+    """
+    if count < 0 or count == 1:
+        raise ValueError("Argument \"--resample\" must be at least 2.")
+    closed = numpy.concatenate((points, points[:1]))
+    lengths = numpy.hypot(*numpy.diff(closed, axis=0).T)
+    # Drop repeated points so the arc length is strictly increasing.
+    keep = numpy.concatenate(([True], lengths > 0))
+    closed = closed[keep]
+    arc_length = numpy.concatenate(([0], numpy.cumsum(lengths[lengths > 0])))
+    total_length = arc_length[-1]
+    if total_length == 0:
+        return points
+    if count <= 0:
+        # Every point of the path is at most half the spacing
+        # away from the nearest sample.
+        count = 1 << max(1, math.ceil(total_length / (2 * tolerance)) - 1).bit_length()
+    targets = numpy.arange(count) * (total_length / count)
+    return numpy.column_stack((
+        numpy.interp(targets, arc_length, closed[:, 0]),
+        numpy.interp(targets, arc_length, closed[:, 1])
+    ))
+
+
 def transform(points):
-    """Calculate circles from points."""
-    complex_points = [complex(*p) for p in points]
-    transformed = list(numpy.fft.ifft(complex_points))
-    offset = complex_to_vec2(transformed.pop(0))
-    harmonics = []
-    circle_radii = []
-    i = 1
-    increase_i = False
-    sign = -1
-    pop_back = False  # pop from the front or the back
-
-    while transformed:
-        radius = transformed.pop(-pop_back)
-        abs_radius = abs(radius)
-        # Only add harmonics over a certain radius threshold to ignore
-        # harmonics which don't noticeably contribute.
-        if abs_radius >= constants.HARMONICS_RADIUS_CUTOFF:
-            # Save radius as complex because the accuracy of
-            # numpy.complex128 is not necessary here.
-            harmonics.append([complex(radius), complex(0, sign * i)])
-        # Only add radius if the associated circle would be large enough
-        # to be visible. Make it int because gfxdraw needs integer
-        # arguments. This list is only used for drawing the circles.
-        if abs_radius >= constants.CIRCLE_RADIUS_CUTOFF:
-            circle_radii.append(int(abs_radius))
-        if increase_i:
-            i += 1
-        increase_i = not increase_i
-        sign *= -1
-        pop_back = not pop_back
-
-    return harmonics, circle_radii, offset
-
-
-def from_image(filename, target_surface_rect):
-    # points = ...
-    # return transform(points)
-    pass
+    """Calculate circles from an (n, 2) array of points.
+
+    Returns the amplitudes and angular velocities of the harmonics as
+    complex128 arrays and the offset.
+    """
+    complex_points = points[:, 0] + 1j * points[:, 1]
+    transformed = numpy.fft.ifft(complex_points)
+    offset = complex_to_vec2(transformed[0])
+
+    # Order the harmonics by alternating from the front and the back of the
+    # remaining coefficients. These have the angular velocities
+    # -1, 1, -2, 2, -3, 3 and so on.
+    count = len(transformed) - 1
+    order = numpy.arange(count)
+    from_front = order % 2 == 0
+    i = order // 2 + 1
+    indices = numpy.where(from_front, i, len(transformed) - i)
+    velocities = numpy.where(from_front, -i, i)
+    radii = transformed[indices]
+    abs_radii = numpy.abs(radii)
+
+    # Only add harmonics over a certain radius threshold to ignore
+    # harmonics which don't noticeably contribute.
+    keep = abs_radii >= constants.HARMONICS_RADIUS_CUTOFF
+    amplitudes = radii[keep]
+    frequencies = numpy.zeros(len(amplitudes), dtype=numpy.complex128)
+    frequencies.imag = velocities[keep]
+
+    return amplitudes, frequencies, offset
+
+
+def truncate(amplitudes, frequencies, max_error=0, energy=0):
+    """Keep only the largest harmonics.
+
+    The fewest harmonics are kept so that either the root mean square
+    deviation from the full shape is at most max_error or their share of
+    the total energy (sum of squared amplitudes) is at least energy.
+    By Parseval's theorem the squared RMS deviation is the energy of the
+    dropped harmonics. Returns the amplitudes and the frequencies of the
+    kept harmonics in their original order.
+    """
+    powers = numpy.abs(amplitudes) ** 2
+    order = numpy.argsort(powers)[::-1]
+    kept_energy = numpy.cumsum(powers[order])
+    total_energy = kept_energy[-1] if len(kept_energy) else 0
+    if max_error > 0:
+        dropped_energy = total_energy - kept_energy
+        count = numpy.searchsorted(-dropped_energy, -max_error ** 2) + 1
+    else:
+        count = numpy.searchsorted(kept_energy, energy * total_energy) + 1
+    keep = numpy.zeros(len(amplitudes), dtype=bool)
+    keep[order[:count]] = True
+    return amplitudes[keep], frequencies[keep]
+
+
+def reconstruction_error(amplitudes, frequencies):
+    """Return the maximum and the root mean square distance that the tip
+    is moved by the given harmonics, measured at enough angles to
+    resolve the highest frequency.
+    """
+    if len(amplitudes) == 0:
+        return 0, 0
+    velocities = frequencies.imag.astype(numpy.int64)
+    size = 1 << max(10, (2 * int(numpy.abs(velocities).max()) + 1).bit_length())
+    spectrum = numpy.zeros(size, dtype=numpy.complex128)
+    numpy.add.at(spectrum, velocities % size, amplitudes)
+    distances = numpy.abs(numpy.fft.ifft(spectrum) * size)
+    return distances.max(), numpy.sqrt(numpy.mean(distances ** 2))
@@ -0,0 +1,100 @@
+import numpy
+
+from src import constants
+from src import phasors
+
+
+FREQUENCIES = 1j * numpy.concatenate((numpy.arange(1, 257), -numpy.arange(1, 257)))
+
+
+def deviation(stepper, angle, count=None):
+    """Return the largest distance between the stepped
+    phasors and the direct formula at angle.
+    """
+    expected = numpy.exp(FREQUENCIES[:count] * angle)
+    return numpy.abs(stepper.at(angle, count) - expected).max()
+
+
+def test_fixed_dt():
+    stepper = phasors.Phasors(FREQUENCIES)
+    angle = 0
+    largest = 0
+    for _ in range(60000):
+        angle += 1 / constants.FPS
+        largest = max(largest, deviation(stepper, angle))
+    assert largest < 1e-9
+    assert len(stepper.step_factors) == 1
+
+
+def test_changing_dt():
+    stepper = phasors.Phasors(FREQUENCIES)
+    angle = 0
+    # Like clock.tick at 60 FPS, which returns whole milliseconds.
+    milliseconds = [17, 17, 16, 17, 18, 16]
+    largest = 0
+    for frame in range(60000):
+        angle += milliseconds[frame % len(milliseconds)] / 1000
+        largest = max(largest, deviation(stepper, angle))
+    assert largest < 1e-9
+    assert len(stepper.step_factors) == 3
+
+
+def test_changing_dt_does_not_evaluate_exactly():
+    stepper = phasors.Phasors(FREQUENCIES, renormalize_interval=1000)
+    angle = 0.017
+    stepper.at(angle)
+    for step in (0.017, 0.016, 0.018, 0.016, 0.017):
+        angle += step
+        stepper.at(angle)
+    assert stepper.steps_left == 1000 - 5
+
+
+def test_reversal():
+    stepper = phasors.Phasors(FREQUENCIES)
+    angle = 0
+    velocities = [1, 2, 4, -4, -1, 1 / 32, 1]
+    largest = 0
+    for frame in range(7 * 499):
+        angle += velocities[frame // 499] / constants.FPS
+        largest = max(largest, deviation(stepper, angle))
+    assert largest < 1e-9
+
+
+def test_renormalize_interval():
+    stepper = phasors.Phasors(FREQUENCIES, renormalize_interval=10)
+    angle = 0
+    stepper.at(angle)
+    for step in range(1, 25):
+        angle += 1 / constants.FPS
+        values = stepper.at(angle)
+        if step % 11 == 0:
+            # Every eleventh call evaluates the phasors exactly again.
+            numpy.testing.assert_array_equal(values, numpy.exp(FREQUENCIES * angle))
+            assert stepper.steps_left == 10
+        else:
+            assert stepper.steps_left == 10 - step % 11
+
+
+def test_count():
+    stepper = phasors.Phasors(FREQUENCIES)
+    angle = 0
+    counts = [512, 128, 128, 32, 256, 512]
+    for frame in range(600):
+        angle += 1 / constants.FPS
+        count = counts[frame // 100]
+        assert len(stepper.at(angle, count)) == count
+        assert deviation(stepper, angle, count) < 1e-9
+
+
+def test_single_precision():
+    frequencies = FREQUENCIES.astype(numpy.complex64)
+    stepper = phasors.Phasors(frequencies)
+    angle = 1000
+    for _ in range(600):
+        angle += 1 / constants.FPS
+        numpy.testing.assert_allclose(
+            stepper.at(angle),
+            numpy.exp(FREQUENCIES * angle),
+            rtol=0,
+            atol=1e-3
+        )